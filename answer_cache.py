@@ -0,0 +1,99 @@
+import sqlite3
+import hashlib
+from time import time
+from threading import Lock
+from os import path, makedirs, listdir, stat
+
+
+def normalize_question(question: str) -> str:
+    """Lower-cases the question and collapses whitespace and trailing question marks"""
+    return " ".join(question.lower().split()).rstrip("? ")
+
+
+def model_fingerprint(model_path=None, *parts) -> str:
+    """Fingerprints the model directory files and any extra parts (context text, settings).
+       File size and modification time are used instead of content so startup stays cheap,
+       saving a retrained model always rewrites its weight files."""
+    digest = hashlib.sha256()
+    if model_path and path.isdir(model_path):
+        for file_name in sorted(listdir(model_path)):
+            file_path = path.join(model_path, file_name)
+            if path.isfile(file_path):
+                file_stat = stat(file_path)
+                digest.update(f"{file_name}:{file_stat.st_size}:{file_stat.st_mtime_ns}".encode())
+    for part in parts:
+        digest.update(str(part).encode())
+
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, db_path: str, fingerprint: str, max_entries=5000) -> None:
+        """On-disk LRU cache of model answers, keyed by normalized question and model fingerprint"""
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+        if path.dirname(db_path) and not path.exists(path.dirname(db_path)):
+            makedirs(path.dirname(db_path))
+
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "fingerprint TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, "
+                "last_used REAL NOT NULL, PRIMARY KEY (fingerprint, question))"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)"
+            )
+            # Answers of a previous model or profile text are no longer valid
+            self.connection.execute(
+                "DELETE FROM answers WHERE fingerprint != ?", (self.fingerprint,)
+            )
+
+    def get(self, question: str):
+        """Returns the cached answer for a question, or None on a miss"""
+        key = normalize_question(question)
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT answer FROM answers WHERE fingerprint = ? AND question = ?",
+                (self.fingerprint, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.connection.execute(
+                "UPDATE answers SET last_used = ? WHERE fingerprint = ? AND question = ?",
+                (time(), self.fingerprint, key)
+            )
+            return row[0]
+
+    def put(self, question: str, answer: str) -> None:
+        """Stores an answer and evicts the least recently used entries over the limit"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO answers (fingerprint, question, answer, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (self.fingerprint, normalize_question(question), answer, time())
+            )
+            self.connection.execute(
+                "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self) -> str:
+        return (f"Answer cache: {self.hits} hits, {self.misses} misses "
+                f"({self.hit_ratio:.1%} hit ratio)")
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,116 @@
+import pickle
+from math import inf
+from os import path
+from random import Random
+
+from sklearn.pipeline import make_pipeline, make_union
+from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+OPEN_TEXT = "__open__"
+SMALL_NUMBERS = {str(number) for number in range(11)}
+
+# Question shapes seen on job forms, filled with every skill to distill the router over skills
+# instead of over the few phrasings in QUESTIONS
+QUESTION_TEMPLATES = (
+    "How many years of experience do you have with {skill}?",
+    "How many years of work experience do you have in {skill}?",
+    "Years of experience in {skill}",
+    "{skill} years",
+    "Are you familiar with {skill}?",
+    "Do you have experience with {skill}?",
+    "Have you worked with {skill}?",
+    "Do you know {skill}?",
+    "How would you rate yourself in {skill} on a scale of 1 to 10?",
+)
+
+
+def answer_class(answer: str) -> str:
+    """Maps an answer to its class, Yes, No, a small integer, or open text"""
+    answer = str(answer).strip()
+    if answer in ("Yes", "No") or answer in SMALL_NUMBERS:
+        return answer
+    return OPEN_TEXT
+
+
+def distillation_questions(skills) -> list:
+    """Every question template filled with every skill"""
+    return [template.format(skill=skill) for skill in skills for template in QUESTION_TEMPLATES]
+
+
+class AnswerRouter:
+    def __init__(self, threshold=0.6) -> None:
+        """Small TF-IDF classifier that predicts Yes, No, or a small integer straight from the
+           question. Low confidence or open text predictions are left to the fine-tuned model."""
+        self.threshold = threshold
+        self.classifier = make_pipeline(
+            make_union(
+                TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+                TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True),
+            ),
+            LogisticRegression(max_iter=1000, C=10),
+        )
+
+    def fit(self, questions: list, answers: list) -> "AnswerRouter":
+        self.classifier.fit(questions, [answer_class(answer) for answer in answers])
+        return self
+
+    def fit_calibrated(self, questions: list, answers: list, eval_fraction: float,
+                       min_precision: float) -> "AnswerRouter":
+        """Fits on all but a held-out share of the questions, sets the threshold to the lowest
+           confidence whose held-out routed answers reach min_precision, then refits on all"""
+        indices = list(range(len(questions)))
+        Random(0).shuffle(indices)
+        eval_count = max(1, int(len(indices) * eval_fraction))
+        eval_indices, train_indices = indices[:eval_count], indices[eval_count:]
+
+        self.fit([questions[i] for i in train_indices], [answers[i] for i in train_indices])
+        self.threshold = self._threshold_for(
+            [questions[i] for i in eval_indices], [answers[i] for i in eval_indices], min_precision
+        )
+        return self.fit(questions, answers)
+
+    def _threshold_for(self, questions: list, answers: list, min_precision: float) -> float:
+        """Lowest confidence at which routed answers are right at least min_precision of the time,
+           inf when no confidence is precise enough so every question goes to the model"""
+        routed = []
+        for probabilities, answer in zip(self.classifier.predict_proba(questions), answers):
+            best = probabilities.argmax()
+            label = self.classifier.classes_[best]
+            if label != OPEN_TEXT:
+                routed.append((probabilities[best], label == answer_class(answer)))
+
+        threshold, correct = inf, 0
+        routed.sort(reverse=True)
+        for count, (confidence, is_correct) in enumerate(routed, 1):
+            correct += is_correct
+            # Equal confidences are routed together, only the last of them can be a threshold
+            if count < len(routed) and routed[count][0] == confidence:
+                continue
+            if correct / count >= min_precision:
+                threshold = confidence
+        return threshold
+
+    def predict(self, question: str):
+        """Returns the predicted answer, or None if the question should go to the model"""
+        probabilities = self.classifier.predict_proba([question])[0]
+        best = probabilities.argmax()
+        label = self.classifier.classes_[best]
+        if label == OPEN_TEXT or probabilities[best] < self.threshold:
+            return None
+        return label
+
+    def save(self, router_path: str) -> None:
+        with open(router_path, "wb") as file:
+            pickle.dump(self, file)
+
+    @staticmethod
+    def load(router_path: str):
+        """Returns the saved router, or None if it is missing or can't be read"""
+        if not path.isfile(router_path):
+            return None
+        try:
+            with open(router_path, "rb") as file:
+                return pickle.load(file)
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            return None
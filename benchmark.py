@@ -0,0 +1,130 @@
+import re
+import sys
+import json
+from os import path, cpu_count
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from statistics import mean, median
+
+from config import QUESTIONS, FINE_TUNED_MODEL_PATH
+
+
+def _percentile(values, percent) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def benchmark_inference(questions=QUESTIONS) -> None:
+    """Compare latency and answer agreement of the eager and quantized models on config.QUESTIONS"""
+    from model import QuestionAnsweringModel
+
+    use_ft_model = path.exists(FINE_TUNED_MODEL_PATH)
+    results = {}
+    for quantized in (False, True):
+        model = QuestionAnsweringModel(use_ft_model, quantized=quantized, answer_cache_path=":memory:")
+        model._predict_answers(questions[:1])  # Warm-up
+
+        latencies, answers = [], []
+        for question in questions:
+            start = perf_counter()
+            answers.append(model.infer_answer(str(model._predict_answers([question])[0])))
+            latencies.append(perf_counter() - start)
+        results["quantized" if model.quantized else "eager"] = (latencies, answers)
+
+    print(f"Inference benchmark on {len(questions)} questions "
+          f"({'fine-tuned T5' if use_ft_model else 'DistilBERT pipeline'})")
+    print(f"{'model':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, (latencies, _) in results.items():
+        print(f"{name:<10}{mean(latencies) * 1000:>10.1f}{median(latencies) * 1000:>10.1f}"
+              f"{_percentile(latencies, 95) * 1000:>10.1f}")
+
+    if len(results) == 2:
+        eager_answers, quantized_answers = results["eager"][1], results["quantized"][1]
+        agreed = sum(a == b for a, b in zip(eager_answers, quantized_answers))
+        print(f"Answer agreement: {agreed}/{len(questions)} ({agreed / len(questions):.1%})")
+        for question, eager, quantized in zip(questions, eager_answers, quantized_answers):
+            if eager != quantized:
+                print(f"  {question!r}: eager={eager!r} quantized={quantized!r}")
+    else:
+        print("No quantized model available, run QAModelCustom.export_quantized_model first.")
+
+
+def benchmark_training_throughput(process_counts=None, num_train_epochs=1) -> None:
+    """Measure training samples/sec of CPU data-parallel training for every process count"""
+    from transformer import train_distributed
+
+    cores = cpu_count() or 1
+    process_counts = process_counts or [count for count in (1, 2, 4, 8, 16, 32) if count <= cores]
+
+    print(f"Training throughput benchmark on {cores} cores, {num_train_epochs} epoch(s) per layout")
+    print(f"{'processes':>10}{'threads':>10}{'samples/sec':>14}{'runtime s':>12}")
+    with TemporaryDirectory() as temp_dir:
+        for process_count in process_counts:
+            metrics_path = path.join(temp_dir, f"metrics_{process_count}.json")
+            train_distributed(process_count, save_path=None, metrics_path=metrics_path,
+                              num_train_epochs=num_train_epochs)
+            with open(metrics_path, encoding="utf-8") as file:
+                metrics = json.load(file)
+            print(f"{process_count:>10}{max(1, cores // process_count):>10}"
+                  f"{metrics['train_samples_per_second']:>14.2f}{metrics['train_runtime']:>12.1f}")
+
+
+def _legacy_clean_text(text) -> str:
+    """The regex clean_text it replaced, kept to compare the worst case"""
+    text = re.sub(r'\s*required\b', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'(\b[\w\s]+\b)\s*\1+', r'\1', text)
+    text = re.sub(r'\b(\w+)\b\s*\?\s*.*\?\s*$', r'\1?', text)
+    text = re.sub(r'(?<!\S)(.+?)(?:(?!\S)\s*|\s*)(\1)(?!\S)', r'\1', text)
+    return ' '.join(text.split()).strip()
+
+
+def benchmark_clean_text(word_counts=(100, 1_000, 10_000, 100_000), legacy_max_words=800) -> None:
+    """Time clean_text on adversarial long labels to show its cost grows linearly with length"""
+    from extract_and_fill import clean_text, _normalize_question
+
+    adversarial_inputs = {
+        "distinct words": lambda n: " ".join(f"w{i}" for i in range(n)),
+        "repeated word": lambda n: "word " * n + "!",
+        "question marks": lambda n: "a? " * n + "b",
+        "repeated label": lambda n: "How many years of experience?" * (n // 5 + 1),
+        "no spaces": lambda n: "ab" * n + "c",
+    }
+
+    print(f"{'input':<16}{'words':>9}{'chars':>9}{'new ms':>10}{'ns/char':>9}{'legacy ms':>11}")
+    worst_per_char = {}
+    for name, build_input in adversarial_inputs.items():
+        for word_count in word_counts:
+            text = build_input(word_count)
+            _normalize_question.cache_clear()
+            start = perf_counter()
+            clean_text(text)
+            elapsed = perf_counter() - start
+
+            legacy = ""
+            if word_count <= legacy_max_words:
+                start = perf_counter()
+                _legacy_clean_text(text)
+                legacy = f"{(perf_counter() - start) * 1000:.2f}"
+
+            per_char = elapsed / len(text) * 1e9
+            worst_per_char[name] = max(worst_per_char.get(name, 0), per_char)
+            print(f"{name:<16}{word_count:>9}{len(text):>9}{elapsed * 1000:>10.2f}{per_char:>9.0f}{legacy:>11}")
+
+    print(f"Worst case: {max(worst_per_char.values()):.0f} ns per character")
+
+    text = build_input(word_counts[-1])
+    start = perf_counter()
+    clean_text(text)
+    print(f"Memoized repeat call: {(perf_counter() - start) * 1e6:.1f} us")
+
+
+BENCHMARKS = {
+    "inference": benchmark_inference,
+    "training": benchmark_training_throughput,
+    "clean_text": benchmark_clean_text,
+}
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [benchmark names...], runs every benchmark without arguments
+    for benchmark_name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[benchmark_name]()
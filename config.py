@@ -6,6 +6,76 @@ FINE_TUNED_MODEL_PATH = path.abspath("fine_tuned_model")
 LOGS_PATH = path.abspath("logs")
 JOBS_POSTING_LOG_PATH = path.abspath("logs/jobs_applied_log.csv")
 TOTAL_JOBS_LOG_PATH = path.abspath("logs/total_jobs_log.csv")
+CACHE_PATH = path.abspath("cache")
+ANSWER_CACHE_PATH = path.abspath("cache/answer_cache.sqlite3")
+QUESTION_INDEX_PATH = path.abspath("cache/question_index.pkl")
+TOKENIZED_DATASET_PATH = path.abspath("cache/tokenized_dataset.pt")
+SELECTOR_CACHE_PATH = path.abspath("cache/selector_cache.json")
+SEEN_JOBS_PATH = path.abspath("cache/seen_jobs.sqlite3")
+
+# Maximum number of answers kept in the on-disk answer cache before LRU eviction
+ANSWER_CACHE_MAX_ENTRIES = 5000
+
+# Questions answered together in one model call, lower it on hosts with little memory
+QA_MAX_BATCH_SIZE = 8
+
+# Fine-tuning setup, changing any of these retrains the model on the next start
+BASE_MODEL_NAME = "t5-small"
+TRAINING_EPOCHS = 35
+TRAINING_BATCH_SIZE = 4
+TRAINING_PATIENCE = 3
+# Share of pairs held out for early stopping of incremental fine-tuning
+TRAINING_EVAL_FRACTION = 0.1
+# CPU data-parallel training processes, pick the layout with "python benchmark.py training"
+TRAINING_PROCESSES = 1
+TRAINING_GRADIENT_ACCUMULATION_STEPS = 1
+
+# New or changed pairs are fine-tuned onto the saved model for a few epochs, mixed with
+# INCREMENTAL_REPLAY_RATIO old pairs per new pair. Above INCREMENTAL_MAX_CHANGED_FRACTION
+# of the pairs changed, the model is trained from scratch instead.
+INCREMENTAL_EPOCHS = 5
+INCREMENTAL_REPLAY_RATIO = 2
+INCREMENTAL_MAX_CHANGED_FRACTION = 0.5
+
+# Number of SUMMARY_TEXT sentences passed as context per question, None passes the whole summary
+CONTEXT_TOP_K = 6
+
+# Minimum cosine similarity to answer directly from the QUESTIONS/ANSWERS pairs without the model,
+# the matched question must also contain every word of the asked one
+QUESTION_INDEX_THRESHOLD = 0.85
+
+# Prefer dynamic int8 quantized models for CPU inference, file is saved inside FINE_TUNED_MODEL_PATH
+USE_QUANTIZED_MODEL = True
+QUANTIZED_MODEL_NAME = "quantized_model.pt"
+
+# Classifier distilled from the fine-tuned model after training, answers Yes/No/small numbers
+# when confident. Its threshold is the lowest confidence whose answers on a held-out
+# ANSWER_ROUTER_EVAL_FRACTION of the questions are right ANSWER_ROUTER_MIN_PRECISION of the time.
+# Saved inside FINE_TUNED_MODEL_PATH.
+ANSWER_ROUTER_NAME = "answer_router.pkl"
+ANSWER_ROUTER_EVAL_FRACTION = 0.2
+ANSWER_ROUTER_MIN_PRECISION = 0.98
+# Skills not in SUMMARY_TEXT, so the router also learns questions about skills the profile lacks
+ANSWER_ROUTER_UNKNOWN_SKILLS = [
+    "Rust", "Go", "Scala", "Kotlin", "Swift", "Ruby on Rails", "PHP", "Perl", "Haskell", "COBOL",
+    "Salesforce", "SAP", "Tableau", "Kubernetes", "Terraform", "Hadoop", "Spark", "Kafka",
+    "Angular", "Vue.js", "Figma", "Photoshop", "AutoCAD", "Unity",
+]
+
+# Shared local inference server, start it with "python inference_server.py" and set
+# USE_INFERENCE_SERVER so every browser worker uses it instead of loading its own model
+USE_INFERENCE_SERVER = False
+INFERENCE_SERVER_HOST = "127.0.0.1"
+INFERENCE_SERVER_PORT = 8765
+
+# Fill all fields of a LinkedIn form step with one script call, typeahead inputs are still typed
+BULK_FORM_FILL = True
+
+# Seconds a learned class name or winning locator is trusted before it is learned again
+SELECTOR_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Applied, saved and skipped jobs are never opened again, failed ones are retried after this many seconds
+SEEN_JOBS_RETRY_FAILED_AFTER = 24 * 60 * 60
 
 # Default answers to basic questions
 DEFAULT_ANSWERS = {
@@ -29,6 +99,35 @@ DEFAULT_ANSWERS = {
     "rate": 4,
 }
 
+# Other names of the skills in SUMMARY_TEXT, used to answer experience questions without the model
+SKILL_ALIASES = {
+    "Google cloud platform": ["GCP", "Google Cloud"],
+    "Amazon Web Services AWS": ["AWS", "Amazon Web Services"],
+    "Microsoft Azure": ["Azure"],
+    "Javascript": ["JS", "Java Script"],
+    "C++": ["CPP"],
+    "Scikit-Learn": ["sklearn", "Scikit Learn"],
+    "PyTorch": ["Torch"],
+    "Power BI": ["PowerBI"],
+    "Web Frontend Development": ["Frontend Development", "Front end Development", "Frontend"],
+    "MongoDB": ["Mongo"],
+    "Data Analysis": ["Data Analytics"],
+    "Data Analyst": ["Data Analysts"],
+}
+
+# Naukri crawl budgets, job pages opened in total, tabs loading at once, and applications.
+# Listed jobs are ranked by CRAWL_TITLE_KEYWORDS and profile skills found in their title and
+# summary, minus CRAWL_DEPTH_PENALTY for every page followed to reach them.
+CRAWL_MAX_PAGES = 60
+CRAWL_MAX_TABS = 4
+CRAWL_TITLE_KEYWORDS = ["data analyst", "data scientist", "machine learning", "python", "software developer"]
+CRAWL_DEPTH_PENALTY = 1.0
+
+# Job pages are opened in reused tabs, LinkedIn preloads TAB_POOL_SIZE job pages at once
+# (Naukri uses CRAWL_MAX_TABS), and a tab is replaced after TAB_POOL_MAX_USES jobs
+TAB_POOL_SIZE = 2
+TAB_POOL_MAX_USES = 20
+
 # Default number of job apply target and log headers
 JOB_APPLY_TARGET = 70
 JOB_LOG_HEADERS = ["Job Title", "Company Name", "Experience", "Salary", "Location",
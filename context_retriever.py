@@ -0,0 +1,34 @@
+import re
+
+from numpy import argsort
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+class ContextRetriever:
+    def __init__(self, context: str, top_k=6) -> None:
+        """Splits the context passage into sentences once and indexes them with TF-IDF"""
+        self.top_k = top_k
+        self.sentences = [' '.join(sentence.split()) for sentence in re.split(r'(?<=[.!?])\s+', context)
+                          if sentence.strip()]
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, stop_words="english")
+        self.sentence_vectors = self.vectorizer.fit_transform(self.sentences)
+
+    def retrieve(self, question: str) -> str:
+        """Returns the top-k sentences most relevant to the question, in passage order"""
+        return self.retrieve_many([question])[0]
+
+    def retrieve_many(self, questions: list) -> list:
+        """Returns the narrowed context for every question using a single vectorizer pass"""
+        if not self.top_k or self.top_k >= len(self.sentences):
+            return [" ".join(self.sentences)] * len(questions)
+
+        # TF-IDF rows are L2 normalized, so the dot product is the cosine similarity
+        scores = (self.vectorizer.transform(questions) @ self.sentence_vectors.T).toarray()
+        contexts = []
+        for question_scores in scores:
+            # Stable sort keeps ties in passage order, so unmatched questions get the opening
+            # sentences, which describe what to answer for anything not mentioned
+            best = sorted(argsort(-question_scores, kind="stable")[:self.top_k])
+            contexts.append(" ".join(self.sentences[i] for i in best))
+
+        return contexts
@@ -0,0 +1,57 @@
+import heapq
+from itertools import count
+
+
+class CrawlFrontier:
+    def __init__(self, max_pages: int, max_tabs: int, max_applications: int, depth_penalty=1.0) -> None:
+        """Priority queue of job pages to open, most relevant first. Budgets bound the pages
+           opened in total, the tabs open at once, and the applications made."""
+        self.max_pages = max_pages
+        self.max_tabs = max(1, max_tabs)
+        self.max_applications = max_applications
+        self.depth_penalty = depth_penalty
+        self.heap = []
+        self.order = count()
+        self.queued = set()
+        self.pages_opened = 0
+        self.lookups = 0
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, job_id, url: str, relevance: float, depth: int) -> bool:
+        """Queues a job page unless it was queued before, keyed by job id or else by url"""
+        if not url:
+            return False
+
+        key = job_id or url
+        self.lookups += 1
+        if key in self.queued:
+            self.duplicates += 1
+            return False
+
+        self.queued.add(key)
+        priority = relevance - self.depth_penalty * depth
+        # Ties keep discovery order
+        heapq.heappush(self.heap, (-priority, next(self.order), {"job_id": job_id, "url": url, "depth": depth}))
+        return True
+
+    def exhausted(self, applications: int) -> bool:
+        return (not self.heap or self.pages_opened >= self.max_pages
+                or applications >= self.max_applications)
+
+    def pop_batch(self, applications: int) -> list:
+        """Returns the most relevant jobs that fit in the tab and page budgets"""
+        if self.exhausted(applications):
+            return []
+
+        size = min(self.max_tabs, self.max_pages - self.pages_opened, len(self.heap))
+        batch = [heapq.heappop(self.heap)[2] for _ in range(size)]
+        self.pages_opened += len(batch)
+        return batch
+
+    def report(self) -> str:
+        duplicate_ratio = self.duplicates / self.lookups if self.lookups else 0.0
+        return (f"Crawl: {self.pages_opened}/{self.max_pages} pages opened, {len(self.queued)} jobs queued, "
+                f"{self.duplicates}/{self.lookups} duplicate listings skipped ({duplicate_ratio:.1%})")
@@ -1,5 +1,6 @@
 import re
-import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
@@ -9,133 +10,263 @@ from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as ec
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
-from config import DEFAULT_ANSWERS
-from model import QuestionAnsweringModel
+from timing import StageTimer
+from selector_cache import SelectorCache
+from skill_table import SkillTable
+from page_scripts import snapshot_linkedin_form, bulk_fill, wait_for_chatbot_question
+from config import DEFAULT_ANSWERS, SUMMARY_TEXT, SKILL_ALIASES, BULK_FORM_FILL
 
+if TYPE_CHECKING:
+    from model import QuestionAnsweringModel
 
-def clean_text(text) -> str:
-    """Remove trailing 'required' or similar words and duplicate parts in the question"""
-    if text:
-        text = re.sub(r'\s*required\b', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'(\b[\w\s]+\b)\s*\1+', r'\1', text)
-        text = re.sub(r'\b(\w+)\b\s*\?\s*.*\?\s*$', r'\1?', text)
-        text = re.sub(r'(?<!\S)(.+?)(?:(?!\S)\s*|\s*)(\1)(?!\S)', r'\1', text)
-        text = ' '.join(text.split())
-        return text.strip()
-    return " "
+# Compiled once, answers experience, rating and familiarity questions without the model
+skill_table = SkillTable(SUMMARY_TEXT, SKILL_ALIASES)
 
 
-class LinkedInExtractAndFill:
-    def __init__(self, apply_box_element: WebElement, model: QuestionAnsweringModel) -> None:
-        """Extract LinkedIn questions and options and fill inputs using Selenium"""
-        self.apply_box_element = apply_box_element
-        self.model = model
-        self.valid_class_name = None
+REQUIRED_PATTERN = re.compile(r'\s*required\b', re.IGNORECASE)
+MAX_REPEATED_PHRASE_WORDS = 8
 
-    def parse_questions_and_answers(self) -> None:
-        """Find and extract job-related form elements using Selenium"""
-        sections = None
-        try:
-            if not self.valid_class_name:
-                all_divs = WebDriverWait(self.apply_box_element, 5).until(
-                    ec.presence_of_all_elements_located((By.TAG_NAME, "div"))
-                )
 
-                class_count = {}
-                for div in all_divs:
-                    class_name = div.get_attribute("class").strip()
-                    if class_name and 40 > len(class_name) > 30:
-                        class_count[class_name] = class_count.get(class_name, 0) + 1
+def _smallest_period(text: str) -> int:
+    """Smallest p such that text is text[:p] repeated, via the KMP prefix function in O(n)"""
+    prefix = [0] * len(text)
+    for i in range(1, len(text)):
+        k = prefix[i - 1]
+        while k and text[i] != text[k]:
+            k = prefix[k - 1]
+        prefix[i] = k + 1 if text[i] == text[k] else k
 
-                self.valid_class_name = next(
-                    (cls for cls, count in class_count.items() if count >= 2), None
-                )
+    period = len(text) - prefix[-1]
+    return period if len(text) % period == 0 else len(text)
 
-            sections = self.apply_box_element.find_elements(By.CLASS_NAME, self.valid_class_name)
 
-        except TimeoutException:
-            self.valid_class_name = None
-            pass
+def _collapse_repeated_text(text: str) -> str:
+    """Keeps one copy of a label repeated end to end, with or without spaces between copies"""
+    positions = [i for i, char in enumerate(text) if not char.isspace()]
+    compact = "".join(text[i] for i in positions)
+    if not compact:
+        return text
 
-        if sections:
-            for section in sections:
-                self._extract_question_and_fill_answer(section)
+    period = _smallest_period(compact)
+    return text[:positions[period - 1] + 1] if period < len(compact) else text
 
-    def _extract_question_and_fill_answer(self, section) -> None:
-        """Extract the question, input type, options, and associated element"""
-        if fieldsets := section.find_elements(
-                By.XPATH, './/fieldset[@data-test-form-builder-radio-button-form-component]'):
-            self._fill_radio(fieldsets[0], section)
 
-        elif selects := section.find_elements(
-                By.XPATH, './/select[@data-test-text-entity-list-form-select]'):
-            self._fill_select(selects[0], section)
+def _trim_trailing_questions(text: str) -> str:
+    """Cuts everything after the first question mark that follows a word when the text ends
+       with another question mark"""
+    if not text.endswith('?'):
+        return text
 
-        elif checkboxes := section.find_elements(By.XPATH, './/input[@type="checkbox"]'):
-            for checkbox in checkboxes:
-                label = checkbox.find_element(By.XPATH, 'following-sibling::label')
-                label.click()
+    previous_char = ''
+    for index in range(len(text) - 1):
+        char = text[index]
+        if char == '?' and (previous_char.isalnum() or previous_char == '_'):
+            return text[:index].rstrip() + '?'
+        if not char.isspace():
+            previous_char = char
+    return text
 
-        elif inputs := section.find_elements(By.XPATH, './/input[@type="text"]'):
-            self._fill_input(section, inputs[0])
 
-    def _fill_radio(self, radio_element, section) -> None:
-        try:
-            radio_buttons = radio_element.find_elements(By.TAG_NAME, 'label')
-            question_text = section.find_element(By.TAG_NAME, 'legend').text.strip()
-            options = [opt.text.strip() for opt in radio_buttons]
-            answer = self._get_answer_from_model(clean_text(question_text))
-
-            if answer not in options:
-                print(f"No valid answer for radio '{question_text}', selecting first option.")
-                radio_buttons[1].click()
-            else:
-                for radio, label in zip(radio_buttons, options):
-                    if label == answer:
-                        radio.click()
-                        break
+def _collapse_repeated_words(words: list) -> list:
+    """Drops a run of up to MAX_REPEATED_PHRASE_WORDS words that repeats the run before it,
+       the bounded run length keeps this linear in the number of words"""
+    collapsed = []
+    for word in words:
+        collapsed.append(word)
+        for length in range(1, min(MAX_REPEATED_PHRASE_WORDS, len(collapsed) // 2) + 1):
+            if collapsed[-length:] == collapsed[-2 * length:-length]:
+                del collapsed[-length:]
+                break
+    return collapsed
 
-        except NoSuchElementException:
-            print(f"Error: Could not find radio buttons in section: {section}")
 
-    def _fill_select(self, select_element, section) -> None:
-        select_object = Select(select_element)
+@lru_cache(maxsize=4096)
+def _normalize_question(text: str) -> str:
+    text = ' '.join(REQUIRED_PATTERN.sub('', text).split())
+    text = _trim_trailing_questions(text)
+    text = _collapse_repeated_text(text)
+    return ' '.join(_collapse_repeated_words(text.split())).strip()
 
-        try:
-            question_text = section.find_element(By.TAG_NAME, 'label').text.strip()
-            options = [opt.text.strip()
-                       for opt in select_element.find_elements(By.TAG_NAME, 'option')
-                       if opt.get_attribute('value')]
-
-            answer = self._get_answer_from_model(clean_text(question_text))
-            if answer not in options:
-                print(f"No valid answer provided for select '{question_text}', choosing the first option.")
-                select_object.select_by_index(1)
+
+def clean_text(text) -> str:
+    """Remove trailing 'required' or similar words and duplicate parts in the question.
+       Runs in linear time in the length of the text and results are memoized."""
+    if text:
+        return _normalize_question(text)
+    return " "
+
+
+class LinkedInExtractAndFill:
+    def __init__(self, apply_box_element: WebElement, model: "QuestionAnsweringModel",
+                 timer: StageTimer = None, selector_cache: SelectorCache = None) -> None:
+        """Extract LinkedIn questions and options and fill inputs using Selenium"""
+        self.apply_box_element = apply_box_element
+        self.model = model
+        self.timer = timer or StageTimer()
+        self.selector_cache = selector_cache or SelectorCache(cache_path=None)
+        self.valid_class_name = self.selector_cache.get("linkedin", "form section")
+
+    def parse_questions_and_answers(self) -> None:
+        """Extract the whole form step, answer all questions in one batch, then fill them"""
+        with self.timer.stage("form extract"):
+            try:
+                snapshot = WebDriverWait(self.apply_box_element, 5).until(
+                    lambda _: self._snapshot_form()
+                )
+            except TimeoutException:
+                # The section class is learned again in the page on the next step
+                self.valid_class_name = None
+                self.selector_cache.invalidate("linkedin", "form section")
+                return
+            # The script validates the cached class and only learns a new one when it is gone
+            self.valid_class_name = snapshot["sectionClass"]
+            self.selector_cache.put("linkedin", "form section", self.valid_class_name)
+
+        with self.timer.stage("form answer"):
+            answers = self._answer_fields(snapshot["fields"])
+
+        with self.timer.stage("form fill"):
+            if BULK_FORM_FILL:
+                self._bulk_fill_fields(snapshot["fields"], answers)
+            else:
+                for field, answer in zip(snapshot["fields"], answers):
+                    self._fill_field(field, answer)
+
+    def _snapshot_form(self):
+        """Returns the form snapshot once the dialog has rendered its sections"""
+        snapshot = snapshot_linkedin_form(self.apply_box_element, self.valid_class_name)
+        return snapshot if snapshot["sectionClass"] else None
+
+    def _answer_fields(self, fields: list) -> list:
+        """Answers known questions directly, the rest go to the model in one batched call per kind"""
+        answers = [None] * len(fields)
+        open_questions, option_questions = {}, {}
+
+        for index, field in enumerate(fields):
+            if field["kind"] == "checkbox" or not field["label"]:
+                continue
+
+            question = clean_text(field["label"])
+            answer = self._get_known_answer(question)
+            if field["kind"] == "text":
+                if answer:
+                    answers[index] = answer
+                else:
+                    open_questions[index] = question
+            elif answer and str(answer) in field["options"]:
+                answers[index] = str(answer)
             else:
-                select_object.select_by_visible_text(answer)
+                option_questions[index] = question
 
-        except NoSuchElementException:
-            print(f"Error: Could not find question in section: {section}")
+        if open_questions:
+            model_answers = self.model.ask_multiple_questions(list(open_questions.values()))
+            for index, answer in zip(open_questions, model_answers):
+                answers[index] = answer
+
+        if option_questions:
+            model_answers = self.model.choose_options(
+                list(option_questions.values()), [fields[index]["options"] for index in option_questions]
+            )
+            for index, answer in zip(option_questions, model_answers):
+                answers[index] = answer
+
+        return answers
+
+    def _bulk_fill_fields(self, fields: list, answers: list) -> None:
+        """Fills every field in one script call, typeahead inputs and fills the script
+           could not apply fall back to per-field Selenium calls"""
+        fills, fallbacks = [], []
+        for field, answer in zip(fields, answers):
+            if field["kind"] == "radio":
+                if radio_button := self._radio_choice(field, answer):
+                    fills.append([radio_button, "click", None])
+                    fallbacks.append(radio_button.click)
+
+            elif field["kind"] == "select":
+                option = self._select_choice(field, answer) or next(iter(field["options"]), None)
+                fills.append([field["elements"][0], "select", option])
+                fallbacks.append(lambda field=field, answer=answer: self._fill_select(field, answer))
+
+            elif field["kind"] == "checkbox":
+                for label in field["elements"]:
+                    fills.append([label, "check", None])
+                    fallbacks.append(label.click)
+
+            elif field["kind"] == "text" and not field.get("typeahead"):
+                fills.append([field["elements"][0], "type", self._input_value(field, answer)])
+                fallbacks.append(lambda field=field, answer=answer: self._fill_input(field, answer))
+
+            elif field["kind"] == "text":
+                self._fill_input(field, answer)
+
+        for index in bulk_fill(self.apply_box_element.parent, fills):
+            fallbacks[index]()
+
+    def _fill_field(self, field: dict, answer) -> None:
+        if field["kind"] == "radio":
+            if radio_button := self._radio_choice(field, answer):
+                radio_button.click()
+
+        elif field["kind"] == "select":
+            self._fill_select(field, answer)
+
+        elif field["kind"] == "checkbox":
+            for label in field["elements"]:
+                label.click()
+
+        elif field["kind"] == "text":
+            self._fill_input(field, answer)
+
+    @staticmethod
+    def _radio_choice(field: dict, answer):
+        """Returns the radio label to click for the answer"""
+        radio_buttons, options = field["elements"], field["options"]
+        if not field["label"] or not radio_buttons:
+            print(f"Error: Could not find radio buttons for question: {field['label']}")
+            return None
+
+        if answer not in options:
+            print(f"No valid answer for radio '{field['label']}', selecting first option.")
+            return radio_buttons[1 if len(radio_buttons) > 1 else 0]
+        return radio_buttons[options.index(answer)]
+
+    @staticmethod
+    def _select_choice(field: dict, answer):
+        """Returns the option text to select, or None to select the first option"""
+        if not field["label"]:
+            print("Error: Could not find question for select field")
+            return None
+
+        if answer not in field["options"]:
+            print(f"No valid answer provided for select '{field['label']}', choosing the first option.")
+            return None
+        return answer
+
+    @staticmethod
+    def _input_value(field: dict, answer):
+        """Known answers and numbers are typed as they are, anything else is answered with 0"""
+        question_text = clean_text(field["label"]) if field["label"] else None
+        if (answer and answer == DEFAULT_ANSWERS.get(question_text) or
+                (isinstance(answer, str) and answer.isdigit()) or
+                isinstance(answer, int)):
+            return answer
+        return 0
+
+    def _fill_select(self, field: dict, answer) -> None:
+        select_object = Select(field["elements"][0])
+        if option := self._select_choice(field, answer):
+            select_object.select_by_visible_text(option)
+        else:
             select_object.select_by_index(1)
 
-    def _fill_input(self, section, input_element) -> None:
-        try:
-            question_text = section.find_element(By.TAG_NAME, 'label')
-            question_text = clean_text(question_text.text.strip())
-            answer = self._get_answer_from_model(question_text)
-
-            if (answer == DEFAULT_ANSWERS.get(question_text) or
-                    (isinstance(answer, str) and answer.isdigit()) or
-                    isinstance(answer, int)):
-                input_element.clear()
-                input_element.send_keys(answer)
-                self._click_outside_to_hide_dropdown()
-            else:
-                raise ValueError
+    def _fill_input(self, field: dict, answer) -> None:
+        input_element = field["elements"][0]
+        value = self._input_value(field, answer)
 
-        except (ValueError, NoSuchElementException):
-            input_element.clear()
-            input_element.send_keys(0)
+        input_element.clear()
+        input_element.send_keys(value)
+        if value != 0:
+            self._click_outside_to_hide_dropdown()
 
     def _click_outside_to_hide_dropdown(self):
         """Click on a non-interactive area to close the suggestion dropdown."""
@@ -148,43 +279,42 @@ class LinkedInExtractAndFill:
         except NoSuchElementException:
             print("Warning: Could not find element to click. Dropdown remain open.")
 
-    def _get_answer_from_model(self, question) -> str:
+    def _get_known_answer(self, question):
         answer = DEFAULT_ANSWERS.get(question)
         if not answer:
-            answer = self.model.ask_question(question)
+            answer = skill_table.answer(question)
+        if not answer:
+            answer = self.model.known_answer(question)
 
         return answer
 
 
 class NaukriDotComExtractAndFill:
-    def __init__(self, driver: WebDriver, model: QuestionAnsweringModel) -> None:
+    def __init__(self, driver: WebDriver, model: "QuestionAnsweringModel", timer: StageTimer = None) -> None:
         """Extract NaukriDotCom questions and options and fill inputs using Selenium"""
         self.driver = driver
         self.model = model
+        self.timer = timer or StageTimer()
         self.fill_answer_try_count = 0
 
     def parse_questions_and_answers(self) -> bool:
-        """Extract and fill job-related form elements in the chatbot interface."""
-        li_locator = (By.CSS_SELECTOR, 'li.botItem.chatbot_ListItem')
+        """Extract and fill job-related form elements in the chatbot interface.
+           Each turn waits in the page for the next question instead of polling."""
         self.fill_answer_try_count = 0
+        minimum_count = 1
 
         try:
             while self.fill_answer_try_count < 11:
-                chat_box_dialog = WebDriverWait(self.driver, 5).until(
-                    ec.presence_of_element_located((By.CSS_SELECTOR, 'div.chatbot_DrawerContentWrapper'))
-                )
-                questions = WebDriverWait(chat_box_dialog, 5).until(
-                    ec.presence_of_all_elements_located(li_locator)
-                )
-                initial_li_count = len(questions)
-                last_question = questions[-1]
+                with self.timer.stage("chatbot wait"):
+                    turn = wait_for_chatbot_question(self.driver, minimum_count)
+                if not turn:
+                    break
 
-                norm_ques = re.sub(r'[^a-zA-Z]', '', last_question.text.strip()).lower()
-                if norm_ques == "thankyouforyourresponses":
-                    if WebDriverWait(self.driver, 3).until(ec.staleness_of(chat_box_dialog)):
+                if turn["kind"] == "finished":
+                    if WebDriverWait(self.driver, 3).until(ec.staleness_of(turn["drawer"])):
                         return True
 
-                self._find_input_type_and_fill(last_question)
+                self._find_input_type_and_fill(turn)
 
                 try:
                     WebDriverWait(self.driver, 5).until(
@@ -194,88 +324,88 @@ class NaukriDotComExtractAndFill:
                     self.fill_answer_try_count += 1
                     continue
 
-                WebDriverWait(self.driver, 5).until(
-                    lambda d: len(d.find_elements(*li_locator)) == initial_li_count + 1
-                )
-                time.sleep(1)  # Wait for the next input div to load. Adjust accordingly.
+                minimum_count = turn["count"] + 1
 
         except (TimeoutException, IndexError):
             pass
 
         return False
 
-    def _find_input_type_and_fill(self, question_element) -> None:
-        try:
-            ul_element = question_element.find_element(By.XPATH, "..")
-            answer_element = ul_element.find_element(By.XPATH, "following-sibling::*")
-        except NoSuchElementException:
-            answer_element = None
-
+    def _find_input_type_and_fill(self, field: dict) -> None:
+        """Answer and fill the current chatbot question, the chatbot asks one per turn"""
         self.fill_answer_try_count += 1
+        if not field["kind"]:
+            return
+
+        with self.timer.stage("form answer"):
+            answer = self._answer_field(field)
 
-        if answer_element:
-            if input_div := answer_element.find_elements(By.CSS_SELECTOR, 'div.textArea'):
-                self._fill_input_div(input_div[0], question_element.text.strip())
+        with self.timer.stage("form fill"):
+            self._fill_field(field, answer)
 
-            elif radio_div := answer_element.find_elements(By.CSS_SELECTOR, 'div.singleselect-radiobutton-container'):
-                self._fill_radio(radio_div[0], question_element.text.strip())
+    def _answer_field(self, field: dict):
+        question_text = clean_text(field["question"])
+        if field["kind"] == "radio":
+            return self._get_option_from_model(question_text, field["options"])
+        return self._get_answer_from_model(question_text)
 
-            elif input_text := answer_element.find_elements(By.XPATH, '//input[@type="text"]'):
-                self._fill_input_text(input_text[0], answer_element, question_element.text.strip())
+    def _fill_field(self, field: dict, answer) -> None:
+        if field["kind"] == "textarea":
+            self._fill_input_div(field["elements"][0], answer)
 
-    def _fill_input_div(self, input_element, question) -> None:
-        question_text = clean_text(question)
-        answer = self._get_answer_from_model(question_text)
+        elif field["kind"] == "radio":
+            self._fill_radio(field["elements"], field["options"], answer)
 
+        elif field["kind"] == "text":
+            self._fill_input_text(field["elements"][0], field["elements"][1:], field["options"], answer)
+
+    @staticmethod
+    def _fill_input_div(input_element, answer) -> None:
+        input_element.clear()
         if str(answer).isalnum():
-            input_element.clear()
             input_element.send_keys(answer)
         else:
-            input_element.clear()
             input_element.send_keys(0)
 
-    def _fill_radio(self, radio_element, question) -> None:
-        try:
-            radio_buttons_divs = radio_element.find_element(By.CSS_SELECTOR, 'div.ssrc__radio-btn-container')
-            options = radio_buttons_divs.find_elements(By.XPATH, './/label')
-            options_text = [opt.text.strip() for opt in options]
-            answer = self._get_answer_from_model(clean_text(question))
-
-            if answer not in options_text:
-                options[0].click()
-            else:
-                for option, label in zip(options, options_text):
-                    if label == answer:
-                        option.click()
-                        break
-
-        except NoSuchElementException:
-            print(f"Error: Could not find radio buttons in section: {radio_element}")
-
-    def _fill_input_text(self, answer_element, input_element, question) -> None:
-        try:
-            question_text = clean_text(question)
-            answer = self._get_answer_from_model(question_text)
-            suggestions = input_element.find_elements(By.CSS_SELECTOR, 'div.ssc__wrapper')
-            suggestions_text = [suggest.text.strip() for suggest in suggestions]
-
-            if answer in suggestions_text:
-                answer_element.clear()
-                answer_element.send_keys(answer)
-                for suggest in suggestions:
-                    if suggest.text.strip() == answer:
-                        suggest.click()
-                        break
-            else:
-                answer_element.send_keys("")
-                suggestions[0].click()
+    @staticmethod
+    def _fill_radio(options, options_text, answer) -> None:
+        if not options:
+            return
+        if answer not in options_text:
+            options[0].click()
+        else:
+            options[options_text.index(answer)].click()
 
-        except NoSuchElementException:
-            print(f"Error: Could not find suggestions in input: {input_element}")
+    @staticmethod
+    def _fill_input_text(input_element, suggestions, suggestions_text, answer) -> None:
+        if answer in suggestions_text:
+            input_element.clear()
+            input_element.send_keys(answer)
+            suggestions[suggestions_text.index(answer)].click()
+        elif suggestions:
+            input_element.send_keys("")
+            suggestions[0].click()
+        else:
+            print(f"Error: Could not find suggestions for input: {input_element}")
 
-    def _get_answer_from_model(self, question) -> str:
+    def _get_known_answer(self, question):
         for k, v in DEFAULT_ANSWERS.items():
             if k.lower() in question.lower():
                 return DEFAULT_ANSWERS[k]
 
+        return skill_table.answer(question) or self.model.known_answer(question)
+
+    def _get_answer_from_model(self, question) -> str:
+        answer = self._get_known_answer(question)
+        if answer:
+            return answer
+
         return self.model.ask_question(question)
+
+    def _get_option_from_model(self, question, options) -> str:
+        """Use a known answer if it is one of the options, otherwise let the model rank them"""
+        answer = self._get_known_answer(question)
+        if answer and str(answer) in options:
+            return str(answer)
+
+        return self.model.choose_option(question, options)
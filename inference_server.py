@@ -0,0 +1,182 @@
+import json
+from os import path
+from queue import Queue, Empty
+from threading import Thread, Event, Lock
+from http.client import HTTPConnection, HTTPException
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import FINE_TUNED_MODEL_PATH
+from config import INFERENCE_SERVER_HOST, INFERENCE_SERVER_PORT
+
+
+class _InferenceJob:
+    def __init__(self, kind: str, payload: dict) -> None:
+        """A single client request waiting for the inference worker"""
+        self.kind = kind
+        self.payload = payload
+        self.result = None
+        self.error = None
+        self.done = Event()
+
+
+class InferenceServer:
+    def __init__(self, model, host=INFERENCE_SERVER_HOST, port=INFERENCE_SERVER_PORT) -> None:
+        """Serves one loaded model to many browser workers over localhost HTTP. Questions that
+           queue up while the model is busy are answered together in one batched call."""
+        self.model = model
+        self.jobs = Queue()
+        self.http_server = ThreadingHTTPServer((host, port), _InferenceRequestHandler)
+        self.http_server.inference_server = self
+        self.worker = Thread(target=self._run_worker, daemon=True)
+
+    def serve_forever(self) -> None:
+        self.worker.start()
+        host, port = self.http_server.server_address[:2]
+        print(f"SUCCESS: Inference server listening on http://{host}:{port}")
+        try:
+            self.http_server.serve_forever()
+        finally:
+            self.http_server.server_close()
+
+    def submit(self, kind: str, payload: dict):
+        """Queues a model request for the worker thread and waits for its result. Known answer
+           and stats requests only read the question index and cache, they run right away."""
+        if kind == "known":
+            return self.model.known_answer(payload["question"])
+        if kind == "stats":
+            return self.model.cache_report()
+        if kind not in ("ask", "choose"):
+            raise ValueError(f"Unknown request kind: {kind}")
+
+        job = _InferenceJob(kind, payload)
+        self.jobs.put(job)
+        job.done.wait()
+        if job.error:
+            raise job.error
+        return job.result
+
+    def _run_worker(self) -> None:
+        """Only this thread touches the model, ask and choose requests are merged into micro-batches"""
+        while True:
+            # Takes whatever queued up while the previous batch ran, never waits for more
+            batch = [self.jobs.get()]
+            while True:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except Empty:
+                    break
+
+            for kind, handler in (("ask", self._answer_batch), ("choose", self._choose_batch)):
+                if jobs := [job for job in batch if job.kind == kind]:
+                    self._run_jobs(jobs, handler)
+
+    @staticmethod
+    def _run_jobs(jobs, handler) -> None:
+        try:
+            handler(jobs)
+        except Exception as e:
+            for job in jobs:
+                job.error = e
+        for job in jobs:
+            job.done.set()
+
+    def _answer_batch(self, jobs) -> None:
+        questions = [question for job in jobs for question in job.payload["questions"]]
+        self._split_results(jobs, self.model.ask_multiple_questions(questions))
+
+    @staticmethod
+    def _split_results(jobs, results) -> None:
+        start = 0
+        for job in jobs:
+            end = start + len(job.payload["questions"])
+            job.result = results[start:end]
+            start = end
+
+    def _choose_batch(self, jobs) -> None:
+        questions = [question for job in jobs for question in job.payload["questions"]]
+        options_lists = [options for job in jobs for options in job.payload["options"]]
+        self._split_results(jobs, self.model.choose_options(questions, options_lists))
+
+
+class _InferenceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, Nagle would hold the body for the delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        kind = self.path.strip("/")
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            response = {"result": self.server.inference_server.submit(kind, payload)}
+            status = 200
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+            status = 500
+
+        body = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class InferenceClient:
+    def __init__(self, host=INFERENCE_SERVER_HOST, port=INFERENCE_SERVER_PORT, timeout=120) -> None:
+        """Thin client with the QuestionAnsweringModel interface backed by an InferenceServer"""
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = None
+        self.lock = Lock()
+
+    def _request(self, kind: str, payload: dict):
+        body = json.dumps(payload).encode()
+        with self.lock:
+            for attempt in range(2):
+                if self.connection is None:
+                    self.connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+                try:
+                    self.connection.request("POST", f"/{kind}", body, {"Content-Type": "application/json"})
+                    response = json.loads(self.connection.getresponse().read())
+                    break
+                except (HTTPException, ConnectionError):
+                    # Server closed the kept-alive connection, reconnect once
+                    self.connection.close()
+                    self.connection = None
+                    if attempt:
+                        raise
+
+        if "error" in response:
+            raise RuntimeError(f"Inference server error: {response['error']}")
+        return response["result"]
+
+    def ask_question(self, question: str):
+        if question:
+            return self._request("ask", {"questions": [question]})[0]
+
+    def ask_multiple_questions(self, questions_list) -> list:
+        return self._request("ask", {"questions": list(questions_list)})
+
+    def choose_option(self, question: str, options: list):
+        return self.choose_options([question], [options])[0]
+
+    def choose_options(self, questions: list, options_lists: list) -> list:
+        return self._request("choose", {"questions": list(questions),
+                                        "options": [list(options) for options in options_lists]})
+
+    def known_answer(self, question: str):
+        return self._request("known", {"question": question})
+
+    def cache_report(self) -> str:
+        return self._request("stats", {})
+
+
+if __name__ == "__main__":
+    from model import QuestionAnsweringModel
+
+    server = InferenceServer(QuestionAnsweringModel(path.exists(FINE_TUNED_MODEL_PATH)))
+    server.serve_forever()
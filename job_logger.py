@@ -1,6 +1,7 @@
 import csv
 from datetime import datetime
 
+from timing import startup_timer
 from config import JOBS_POSTING_LOG_PATH, TOTAL_JOBS_LOG_PATH
 
 
@@ -24,6 +25,9 @@ def log_applied_job(job_info, site_name):
         writer = csv.writer(file)
         writer.writerow(new_job)
 
+    if startup_timer.mark("first application"):
+        print(startup_timer.report("Startup timings"))
+
 
 def total_jobs_log(jobs_extracted, jobs_traversed, jobs_applied, jobs_saved, site_name):
     now = datetime.now()
@@ -1,4 +1,5 @@
 import time
+from typing import TYPE_CHECKING
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -9,24 +10,58 @@ from selenium.common.exceptions import ElementClickInterceptedException
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.common.exceptions import StaleElementReferenceException, InvalidSelectorException
 
-from model import QuestionAnsweringModel
+from timing import StageTimer
+from selector_cache import SelectorCache
+from page_scripts import extract_job_info, job_listings_of
+from tab_pool import TabPool
+from seen_jobs import SeenJobIndex, job_id_from_url, APPLIED, SAVED, FAILED
 from extract_and_fill import LinkedInExtractAndFill
 from job_logger import log_applied_job, total_jobs_log
-from config import JOB_APPLY_TARGET
+from config import JOB_APPLY_TARGET, TAB_POOL_SIZE
+
+if TYPE_CHECKING:
+    from model import QuestionAnsweringModel
 
 DEFAULT_LINK = "https://www.linkedin.com/jobs/collections/recommended/"
+SITE_NAME = "linkedin"
+JOB_ID_ATTRIBUTES = ["data-occludable-job-id", "data-job-id"]
+JOB_ID_URL_PATTERN = r"(?:/jobs/view/|currentJobId=)(\d+)"
+JOB_URL_TEMPLATE = "https://www.linkedin.com/jobs/view/{job_id}/"
+JOB_TITLE_SELECTOR = "a.job-card-container__link, a.job-card-list__title"
+JOB_INFO_ANCHOR = "div.job-details-jobs-unified-top-card__job-title"
+JOB_INFO_FIELDS = {
+    "job_position": {"selector": "div.job-details-jobs-unified-top-card__job-title"},
+    "company_name": {"selector": "div.job-details-jobs-unified-top-card__company-name"},
+    "experience_level": {
+        "selector": "span.job-details-jobs-unified-top-card__job-insight-view-model-secondary[dir='ltr']"
+    },
+    "salary": {
+        "selector": "li.job-details-jobs-unified-top-card__job-insight:first-of-type span[dir='ltr']:not([class])"
+    },
+    "job_location": {
+        "selector": "div.job-details-jobs-unified-top-card__primary-description-container span", "split": ","
+    },
+    # "Easy Apply" or "Apply", tells Easy Apply jobs apart when the list card had no text
+    "apply_button": {"selector": "div.jobs-apply-button--top-card button.jobs-apply-button"},
+}
 
 
 class LinkedInApply:
-    def __init__(self, driver: WebDriver, model: QuestionAnsweringModel, link=None) -> None:
+    def __init__(self, driver: WebDriver, model: "QuestionAnsweringModel", link=None,
+                 seen_jobs: SeenJobIndex = None) -> None:
         """LinkedIn class to apply to all LinkedIn easy-apply jobs through Selenium webdriver"""
         self.driver = driver
         self.model = model
+        self.seen_jobs = seen_jobs or SeenJobIndex()
+        self.current_job_id = job_id_from_url(link, JOB_ID_URL_PATTERN)
         self.job_info = dict()
         self.all_jobs_count = 1
         self.jobs_traversed = 0
         self.jobs_applied = 0
         self.apply_dialog_box = None
+        self.timer = StageTimer()
+        self.application_timer = StageTimer()
+        self.selector_cache = SelectorCache()
         self.link = DEFAULT_LINK if not link else link
 
         self.driver.get(self.link)
@@ -70,25 +105,41 @@ class LinkedInApply:
         self.easy_apply_to_jobs()
 
     def easy_apply_to_jobs(self) -> None:
-        """Continue applying for jobs till target is hit."""
+        """Continue applying for jobs till target is hit. The job list stays loaded in its tab
+           while job pages are loaded, a few at once, in reused pool tabs."""
+        tab_pool = TabPool(self.driver, TAB_POOL_SIZE)
         try:
             while JOB_APPLY_TARGET >= self.jobs_applied:
-                for job in self._get_all_job_postings():
-                    self.driver.execute_script("arguments[0].scrollIntoView(true);", job)
-                    WebDriverWait(self.driver, 2).until(ec.visibility_of(job))
-
-                    try:
-                        job.click()
-                        if self.easy_apply_single_job(job.text):
-                            self.jobs_traversed += 1
-                    except (ElementClickInterceptedException, StaleElementReferenceException):
-                        print("ERROR: Failed to click due to an overlay OR Element is stale. Reloading.\n")
+                listings = [listing for listing in self._get_job_listings()
+                            if listing["jobId"] and not self.seen_jobs.is_done(SITE_NAME, listing["jobId"])]
+                if not listings:
+                    print("SUCCESS: Every listed job was already applied, saved or skipped.")
+                    break
+
+                for start in range(0, len(listings), tab_pool.size):
+                    batch = listings[start:start + tab_pool.size]
+                    tabs = tab_pool.open([JOB_URL_TEMPLATE.format(job_id=listing["jobId"]) for listing in batch])
+                    for tab, listing in zip(tabs, batch):
+                        self.driver.switch_to.window(tab)
+                        self.current_job_id = listing["jobId"]
+                        try:
+                            if self.easy_apply_single_job(listing["text"]):
+                                self.jobs_traversed += 1
+                        except (ElementClickInterceptedException, StaleElementReferenceException):
+                            print("ERROR: Failed to click due to an overlay OR Element is stale. Skipping.\n")
+                            # Retried only after SEEN_JOBS_RETRY_FAILED_AFTER, not on every reload of the list
+                            self.seen_jobs.mark(SITE_NAME, listing["jobId"], FAILED)
+                        tab_pool.release(tab)
+
+                    if JOB_APPLY_TARGET < self.jobs_applied:
                         break
 
                 self.driver.get(self.link)
 
         except Exception as e:
             print(e)
+        finally:
+            tab_pool.close()
 
         total_jobs_log(
             self.all_jobs_count,
@@ -97,6 +148,14 @@ class LinkedInApply:
             self.jobs_traversed - self.jobs_applied,
             "LinkedIn"
         )
+        print(self.timer.report("LinkedIn application timings"))
+        print(self.seen_jobs.report())
+
+    def _get_job_listings(self) -> list:
+        """Reads id and card text of every listed job in one round trip"""
+        return job_listings_of(
+            self.driver, self._get_all_job_postings(), JOB_ID_ATTRIBUTES, JOB_ID_URL_PATTERN, JOB_TITLE_SELECTOR
+        )
 
     def _get_all_job_postings(self):
         """Extract all jobs posting from UL element"""
@@ -112,33 +171,34 @@ class LinkedInApply:
 
     def _get_job_info(self) -> None:
         """Saves Job position, Organisation name, and Jobs location in a list"""
-        job_info_css_paths = {
-            "job_position": "div.job-details-jobs-unified-top-card__job-title",
-            "company_name": "div.job-details-jobs-unified-top-card__company-name",
-            "experience_level": "span.job-details-jobs-unified-top-card__job-insight-view-model-secondary[dir='ltr']",
-            "salary": "li.job-details-jobs-unified-top-card__job-insight:first-of-type span[dir='ltr']:not([class])",
-            "job_location": "div.job-details-jobs-unified-top-card__primary-description-container span",
-        }
-        for info_tag, path in job_info_css_paths.items():
-            try:
-                info = WebDriverWait(self.driver, 5).until(
-                    ec.presence_of_element_located((By.CSS_SELECTOR, path))
-                )
-                info = info.text.split(",")[0] if info_tag == "job_location" else info.text
-                self.job_info[info_tag] = info
-            except TimeoutException:
-                self.job_info[info_tag] = None
+        self.job_info = extract_job_info(self.driver, JOB_INFO_ANCHOR, JOB_INFO_FIELDS)
 
     def easy_apply_single_job(self, job_description="Easy Apply") -> bool:
-        """Easy apply for job by filling out form and answering any additional questions."""
-        self._get_job_info()
-
-        if "Easy Apply" not in job_description or not self._apply_button_click():
+        """Easy apply for job by filling out form and answering any additional questions.
+           Time spent in every stage is added to the session timings."""
+        self.application_timer = StageTimer()
+        try:
+            return self._easy_apply_single_job(job_description)
+        finally:
+            self.timer.merge(self.application_timer)
+
+    def _easy_apply_single_job(self, job_description) -> bool:
+        with self.application_timer.stage("job info"):
+            self._get_job_info()
+        # Cards scrolled out of view have no text, the job page's apply button tells then,
+        # and if it wasn't found either the apply click decides
+        job_description = job_description or self.job_info["apply_button"] or "Easy Apply"
+
+        with self.application_timer.stage("apply click"):
+            apply_button_clicked = "Easy Apply" in job_description and self._apply_button_click()
+        if not apply_button_clicked:
             self._save_job_for_later()
+            self.seen_jobs.mark(SITE_NAME, self.current_job_id, SAVED)
             return True
 
         self._get_apply_dialog_box()
         if not self.apply_dialog_box:
+            self.seen_jobs.mark(SITE_NAME, self.current_job_id, FAILED)
             return False
 
         attempted, attempts = 0, 8
@@ -154,7 +214,9 @@ class LinkedInApply:
                     continue_button.click()
                     print(f'SUCCESS: Successfully applied for: {self.job_info["job_position"]},'
                           f' at {self.job_info["company_name"]}!')
+                    print(f"Application timings: {self.application_timer.summary()}")
                     self.jobs_applied += 1
+                    self.seen_jobs.mark(SITE_NAME, self.current_job_id, APPLIED)
                     log_applied_job(self.job_info, "LinkedIn")
                     self._close_submitted_dialog_box()
                     return True
@@ -170,6 +232,7 @@ class LinkedInApply:
 
             except (TimeoutException, ElementClickInterceptedException):
                 print(f"ERROR: Application '{self.job_info['job_position']}' could not be pass! Disposing.")
+                self.seen_jobs.mark(SITE_NAME, self.current_job_id, FAILED)
                 self._close_apply_dialog_box()
                 return False
 
@@ -177,15 +240,16 @@ class LinkedInApply:
         """Clicks on apply button and checks for suspicious activity dialog-box"""
         apply_button_clicked = False
         apply_button_paths = {
-            By.XPATH: "//button[contains(@class, 'jobs-apply-button') and contains(., 'Easy Apply')]",
-            By.CSS_SELECTOR: "button#ember45.jobs-apply-button.artdeco-button.artdeco-button--3"
+            "//button[contains(@class, 'jobs-apply-button') and contains(., 'Easy Apply')]": By.XPATH,
+            "button#ember45.jobs-apply-button.artdeco-button.artdeco-button--3": By.CSS_SELECTOR
         }
-        for selector_method, path in apply_button_paths.items():
+        for path in self.selector_cache.ordered("linkedin", "apply button", list(apply_button_paths)):
             try:
                 WebDriverWait(self.driver, 5).until(
-                    ec.element_to_be_clickable((selector_method, path))
+                    ec.element_to_be_clickable((apply_button_paths[path], path))
                 ).click()
                 apply_button_clicked = True
+                self.selector_cache.put("linkedin", "apply button", path)
                 break
             except TimeoutException:
                 print("ERROR: Easy Apply button not found! Checking another path!")
@@ -257,12 +321,13 @@ class LinkedInApply:
         info_text = ""
         prompts_paths = ['h3.t-16.t-bold', 'h3.t-16.mb2']
 
-        for xpath in prompts_paths:
+        for xpath in self.selector_cache.ordered("linkedin", "form prompt", prompts_paths):
             try:
                 info_text = WebDriverWait(self.apply_dialog_box, 2).until(
                     ec.presence_of_element_located(
                         (By.CSS_SELECTOR, xpath)
                     )).text
+                self.selector_cache.put("linkedin", "form prompt", xpath)
                 break
             except TimeoutException:
                 pass
@@ -290,7 +355,9 @@ class LinkedInApply:
 
     def _get_additional_questions_and_answer(self) -> None:
         """Extract questions and its type if the form requires additional info"""
-        extractor = LinkedInExtractAndFill(self.apply_dialog_box, self.model)
+        extractor = LinkedInExtractAndFill(
+            self.apply_dialog_box, self.model, self.application_timer, self.selector_cache
+        )
         extractor.parse_questions_and_answers()
 
     def _close_apply_dialog_box(self) -> None:
@@ -1,19 +1,34 @@
 # Python 3.12
 
+# Imported first so the startup timings include module imports
+from timing import startup_timer
+
 import csv
-from os import path, makedirs, listdir
+from os import path, makedirs
+from typing import TYPE_CHECKING
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 
-from transformer import QAModelCustom
-from model import QuestionAnsweringModel
+from inference_server import InferenceClient
 from linkedin import LinkedInApply
 from naukridotcom import NaukriDotComApply
+from seen_jobs import SeenJobIndex
+from extract_and_fill import skill_table
+from training_manifest import training_hyperparameters, build_training_manifest
+from training_manifest import is_model_current, changed_pairs, pair_hashes, is_artifact_current
 
-from config import PROFILE_PATH, FINE_TUNED_MODEL_PATH
+from config import PROFILE_PATH, FINE_TUNED_MODEL_PATH, CACHE_PATH
 from config import LOGS_PATH, JOBS_POSTING_LOG_PATH, JOB_LOG_HEADERS
 from config import TOTAL_JOBS_LOG_PATH, TOTAL_JOBS_LOG_HEADERS
+from config import USE_INFERENCE_SERVER, ANSWER_ROUTER_NAME
+from config import BASE_MODEL_NAME, TRAINING_EPOCHS, INCREMENTAL_MAX_CHANGED_FRACTION
+from config import TRAINING_PROCESSES, TRAINING_GRADIENT_ACCUMULATION_STEPS
+from config import SUMMARY_TEXT, QUESTIONS, ANSWERS, CONTEXT_TOP_K
+
+if TYPE_CHECKING:
+    from model import QuestionAnsweringModel
 
 # False these both if you don't want to train the model
 MODEL_TRAINING, USE_FT_MODEL = True, True
@@ -28,6 +43,9 @@ def prerequisites():
     if not path.exists(LOGS_PATH):
         makedirs(LOGS_PATH)
 
+    if not path.exists(CACHE_PATH):
+        makedirs(CACHE_PATH)
+
     if not path.isfile(JOBS_POSTING_LOG_PATH):
         with open(JOBS_POSTING_LOG_PATH, mode='a',
                   newline='', encoding='utf-8') as file:
@@ -40,54 +58,144 @@ def prerequisites():
             writer = csv.writer(file)
             writer.writerow(TOTAL_JOBS_LOG_HEADERS)
 
+    # Skill questions are answered from the summary, flag curated answers that say otherwise
+    for question, table_answer, curated_answer in skill_table.disagreements(QUESTIONS, ANSWERS):
+        print(f"Warning: SUMMARY_TEXT answers {table_answer!r} but ANSWERS has {curated_answer!r} "
+              f"for: {question.strip()}")
+
+    manifest = build_training_manifest(BASE_MODEL_NAME, training_hyperparameters())
     if path.exists(FINE_TUNED_MODEL_PATH):
-        if len(listdir(FINE_TUNED_MODEL_PATH)) >= 6:
+        if is_model_current(FINE_TUNED_MODEL_PATH, manifest):
             MODEL_TRAINING = False
     else:
         USE_FT_MODEL = False
 
     if MODEL_TRAINING:
-        print("Training the model on given Dataset!")
-        model_training = QAModelCustom()
-        model_training.train_model(num_train_epochs=35)
-        model_training.save_model(save_path=FINE_TUNED_MODEL_PATH)
+        # Training is the only path that needs TensorFlow and the Trainer stack
+        from transformer import QAModelCustom, train_distributed
+        from context_retriever import ContextRetriever
+
+        changed_indices = None
+        if path.exists(FINE_TUNED_MODEL_PATH):
+            contexts = ContextRetriever(SUMMARY_TEXT, CONTEXT_TOP_K).retrieve_many(QUESTIONS)
+            changed_indices = changed_pairs(
+                FINE_TUNED_MODEL_PATH, manifest, pair_hashes(QUESTIONS, ANSWERS, contexts)
+            )
+
+        if (changed_indices is not None
+                and len(changed_indices) <= len(QUESTIONS) * INCREMENTAL_MAX_CHANGED_FRACTION):
+            print(f"Fine-tuning the model on {len(changed_indices)} new or changed questions!")
+            model_training = QAModelCustom(checkpoint_path=FINE_TUNED_MODEL_PATH)
+            model_training.train_incremental(changed_indices)
+        elif TRAINING_PROCESSES > 1:
+            print(f"Training the model on given Dataset with {TRAINING_PROCESSES} processes!")
+            # Saved by the first training process
+            model_training = None
+            train_distributed(
+                TRAINING_PROCESSES,
+                gradient_accumulation_steps=TRAINING_GRADIENT_ACCUMULATION_STEPS,
+                save_path=FINE_TUNED_MODEL_PATH,
+                num_train_epochs=TRAINING_EPOCHS,
+            )
+        else:
+            print("Training the model on given Dataset!")
+            model_training = QAModelCustom()
+            model_training.train_model(num_train_epochs=TRAINING_EPOCHS)
+
+        if model_training:
+            model_training.save_model(save_path=FINE_TUNED_MODEL_PATH)
+            model_training.export_quantized_model(save_path=FINE_TUNED_MODEL_PATH)
         print("SUCCESS: Model trained and saved.")
 
+    # Distilled after every save, the router is built from the saved model's answers
+    if (path.exists(FINE_TUNED_MODEL_PATH)
+            and not is_artifact_current(FINE_TUNED_MODEL_PATH, ANSWER_ROUTER_NAME)):
+        from model import QuestionAnsweringModel
+
+        print("Distilling the answer router from the fine-tuned model!")
+        QuestionAnsweringModel(True).distill_router()
+        print("SUCCESS: Answer router distilled and saved.")
+
+
+class DeferredModel:
+    def __init__(self, model_future: Future) -> None:
+        """Stands in for the model while it loads in the background, the first
+           attribute access waits for the load to finish"""
+        self.model_future = model_future
+
+    def __getattr__(self, name):
+        return getattr(self.model_future.result(), name)
 
-def linkedin_job_apply(driver: webdriver, model: QuestionAnsweringModel, link=None) -> None:
+    def load_error(self):
+        """Returns the exception the background load failed with, or None, never waits"""
+        return self.model_future.exception() if self.model_future.done() else None
+
+
+def load_model():
+    """Loads the model or connects to the shared inference server, heavy ML imports happen here"""
+    with startup_timer.stage("model load"):
+        if USE_INFERENCE_SERVER:
+            qa_model = InferenceClient()
+        else:
+            from model import QuestionAnsweringModel
+            qa_model = QuestionAnsweringModel(USE_FT_MODEL)
+
+    startup_timer.mark("model ready")
+    return qa_model
+
+
+def linkedin_job_apply(driver: webdriver, model: "QuestionAnsweringModel", link=None,
+                       seen_jobs: SeenJobIndex = None) -> None:
     if not link:
-        linkedin_apply = LinkedInApply(driver=driver, model=model)
+        linkedin_apply = LinkedInApply(driver=driver, model=model, seen_jobs=seen_jobs)
         linkedin_apply.easy_apply_to_jobs()
         # linkedin_apply.search_jobs_apply("Python Developer")
     else:
-        linkedin_single_apply = LinkedInApply(driver, model, link)
+        linkedin_single_apply = LinkedInApply(driver, model, link, seen_jobs)
         linkedin_single_apply.easy_apply_single_job()
 
 
-def naukridotcom_job_apply(driver: webdriver, model: QuestionAnsweringModel, link=None) -> None:
+def naukridotcom_job_apply(driver: webdriver, model: "QuestionAnsweringModel", link=None,
+                           seen_jobs: SeenJobIndex = None) -> None:
     if not link:
-        naukri_apply = NaukriDotComApply(driver=driver, model=model)
+        naukri_apply = NaukriDotComApply(driver=driver, model=model, seen_jobs=seen_jobs)
         naukri_apply.apply_recommended_jobs()
     else:
-        naukri_single_apply = NaukriDotComApply(driver, model, link,)
+        naukri_single_apply = NaukriDotComApply(driver, model, link, seen_jobs)
         naukri_single_apply.apply_to_job()
 
 
 def main():
-    prerequisites()
-
-    chrome_options = Options()
-    chrome_options.add_argument(f"user-data-dir={PROFILE_PATH}")
-    web_driver = webdriver.Chrome(options=chrome_options)
-    web_driver.maximize_window()
-
-    qa_model = QuestionAnsweringModel(USE_FT_MODEL)
-
+    with startup_timer.stage("prerequisites"):
+        prerequisites()
+
+    # Model loads on a background thread while Chrome launches and login is checked
+    executor = ThreadPoolExecutor(max_workers=1)
+    qa_model = DeferredModel(executor.submit(load_model))
+    executor.shutdown(wait=False)
+
+    with startup_timer.stage("chrome launch"):
+        chrome_options = Options()
+        chrome_options.add_argument(f"user-data-dir={PROFILE_PATH}")
+        web_driver = webdriver.Chrome(options=chrome_options)
+        web_driver.maximize_window()
+
+    # Shared by both sites so a job handled once is never opened again
+    seen_jobs = SeenJobIndex()
     try:
-        linkedin_job_apply(web_driver, qa_model)
-        naukridotcom_job_apply(web_driver, qa_model)
+        linkedin_job_apply(web_driver, qa_model, seen_jobs=seen_jobs)
+        naukridotcom_job_apply(web_driver, qa_model, seen_jobs=seen_jobs)
     finally:
         web_driver.quit()
+        seen_jobs.close()
+        print(startup_timer.report("Startup timings"))
+        # Reporting must not wait for a load still running or re-raise a failed one over the original error
+        if not qa_model.model_future.done():
+            print("Model was still loading, no answer cache report.")
+        elif load_error := qa_model.load_error():
+            print(f"ERROR: Model failed to load: {type(load_error).__name__}: {load_error}")
+        else:
+            print(qa_model.cache_report())
 
 
 if __name__ == "__main__":
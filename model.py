@@ -1,38 +1,131 @@
 import re
+from os import path, environ
+from difflib import SequenceMatcher
 from logging import getLogger, ERROR
 from warnings import filterwarnings
-from tensorflow import compat
-from torch import device, cuda
+
+# Inference is PyTorch only, keep transformers from importing TensorFlow
+environ.setdefault("USE_TF", "0")
+
+from torch import device, cuda, no_grad, load, qint8, tensor
+from torch.nn import Linear
+from torch.quantization import quantize_dynamic
 from transformers import pipeline
+from transformers.modeling_outputs import BaseModelOutput
 from transformers import T5ForConditionalGeneration, T5Tokenizer
 
-from config import SUMMARY_TEXT
+from answer_cache import AnswerCache, model_fingerprint
+from context_retriever import ContextRetriever
+from question_index import QuestionIndex
+from answer_router import AnswerRouter, distillation_questions
+from skill_table import SkillTable
+from training_manifest import is_artifact_current
+from config import SUMMARY_TEXT, QUESTIONS, ANSWERS
 from config import FINE_TUNED_MODEL_PATH
+from config import ANSWER_CACHE_PATH, ANSWER_CACHE_MAX_ENTRIES
+from config import QA_MAX_BATCH_SIZE, CONTEXT_TOP_K
+from config import QUESTION_INDEX_PATH, QUESTION_INDEX_THRESHOLD
+from config import QUANTIZED_MODEL_NAME, USE_QUANTIZED_MODEL
+from config import ANSWER_ROUTER_NAME, ANSWER_ROUTER_EVAL_FRACTION, ANSWER_ROUTER_MIN_PRECISION
+from config import ANSWER_ROUTER_UNKNOWN_SKILLS, SKILL_ALIASES
+
+QA_PIPELINE_MODEL = "distilbert-base-cased-distilled-squad"
+QA_PIPELINE_REVISION = "626af31"
 
 
 class QuestionAnsweringModel:
-    def __init__(self, model_training=False):
-        """Initializes a question-answering model, either pre-trained or fine-tuned"""
+    def __init__(self, model_training=False, max_batch_size=QA_MAX_BATCH_SIZE,
+                 quantized=USE_QUANTIZED_MODEL, answer_cache_path=ANSWER_CACHE_PATH):
+        """Initializes a question-answering model, either pre-trained or fine-tuned.
+           On CPU a quantized int8 model is preferred when quantized is set."""
 
-        # Set TensorFlow logging level to ERROR to suppress info logs
-        compat.v1.logging.set_verbosity(compat.v1.logging.ERROR)
         getLogger("transformers").setLevel(ERROR)
         filterwarnings("ignore", category=FutureWarning)
 
         self.number_pattern = re.compile(r'\b\d+\b')
         self.train_model = model_training
+        self.max_batch_size = max(1, max_batch_size)
+        self.retriever = ContextRetriever(SUMMARY_TEXT, CONTEXT_TOP_K)
+        self.question_index = QuestionIndex(
+            QUESTIONS, ANSWERS, QUESTION_INDEX_PATH, QUESTION_INDEX_THRESHOLD
+        )
+
+        self.device = device("cuda" if cuda.is_available() else "cpu")
+        self.quantized = quantized and self.device.type == "cpu"
 
         if self.train_model:
             self.tokenizer = T5Tokenizer.from_pretrained(FINE_TUNED_MODEL_PATH)
-            self.model = T5ForConditionalGeneration.from_pretrained(FINE_TUNED_MODEL_PATH)
-            self.device = device("cuda" if cuda.is_available() else "cpu")
-            self.model = self.model.to(self.device)
+            if self.quantized and is_artifact_current(FINE_TUNED_MODEL_PATH, QUANTIZED_MODEL_NAME):
+                self.model = load(path.join(FINE_TUNED_MODEL_PATH, QUANTIZED_MODEL_NAME), weights_only=False)
+            else:
+                self.quantized = False
+                self.model = T5ForConditionalGeneration.from_pretrained(FINE_TUNED_MODEL_PATH)
+                self.model = self.model.to(self.device)
+            self.model.eval()
+            self.router = self._load_router()
         else:
+            self.router = None
             self.qa_model = pipeline(
                 "question-answering",
-                model="distilbert-base-cased-distilled-squad",
-                revision="626af31"
+                model=QA_PIPELINE_MODEL,
+                revision=QA_PIPELINE_REVISION
             )
+            if self.quantized:
+                self.qa_model.model = quantize_dynamic(self.qa_model.model, {Linear}, dtype=qint8)
+
+        if self.train_model:
+            fingerprint = model_fingerprint(
+                FINE_TUNED_MODEL_PATH, SUMMARY_TEXT, CONTEXT_TOP_K, self.quantized
+            )
+        else:
+            fingerprint = model_fingerprint(
+                None, QA_PIPELINE_MODEL, QA_PIPELINE_REVISION, SUMMARY_TEXT, CONTEXT_TOP_K, self.quantized
+            )
+        self.answer_cache = AnswerCache(answer_cache_path, fingerprint, ANSWER_CACHE_MAX_ENTRIES)
+
+    @staticmethod
+    def _load_router():
+        """Loads the answer router distilled by distill_router, or None when missing or stale."""
+        if not is_artifact_current(FINE_TUNED_MODEL_PATH, ANSWER_ROUTER_NAME):
+            return None
+
+        router = AnswerRouter.load(path.join(FINE_TUNED_MODEL_PATH, ANSWER_ROUTER_NAME))
+        if router is None:
+            print("ERROR: Could not load the answer router, questions go to the model.")
+        return router
+
+    def distill_router(self) -> AnswerRouter:
+        """Distills the answer router over QUESTIONS labelled with ANSWERS and templated questions
+           about profile skills, labelled from the SkillTable, and unknown skills, labelled by the model."""
+        skill_table = SkillTable(SUMMARY_TEXT, SKILL_ALIASES)
+        for skill in ANSWER_ROUTER_UNKNOWN_SKILLS:
+            if skill_table.find_skills(skill):
+                raise ValueError(f"Unknown router skill {skill} is a profile skill in SUMMARY_TEXT")
+
+        profile_questions = distillation_questions(sorted(skill_table.familiar | set(skill_table.aliases)))
+        unknown_questions = distillation_questions(ANSWER_ROUTER_UNKNOWN_SKILLS)
+        questions = list(QUESTIONS) + profile_questions + unknown_questions
+        answers = ([self.infer_answer(str(answer)) for answer in ANSWERS]
+                   + [skill_table.answer(question) for question in profile_questions]
+                   + [None] * len(unknown_questions))
+
+        teacher_indices = [index for index, answer in enumerate(answers) if answer is None]
+        for start in range(0, len(teacher_indices), self.max_batch_size):
+            batch = teacher_indices[start:start + self.max_batch_size]
+            predictions = self._predict_answers([questions[index] for index in batch])
+            for index, prediction in zip(batch, predictions):
+                answers[index] = self.infer_answer(str(prediction))
+
+        router = AnswerRouter().fit_calibrated(
+            questions, answers, ANSWER_ROUTER_EVAL_FRACTION, ANSWER_ROUTER_MIN_PRECISION
+        )
+        router.save(path.join(FINE_TUNED_MODEL_PATH, ANSWER_ROUTER_NAME))
+        self.router = router
+        return router
+
+    def _route(self, question: str):
+        """Answers from the distilled router when it is confident, otherwise returns None."""
+        return self.router.predict(question) if self.router else None
 
     def infer_answer(self, text: str) -> str:
         """Infers the answer from the given text."""
@@ -47,29 +140,155 @@ class QuestionAnsweringModel:
         else:
             return ""
 
+    def cache_report(self) -> str:
+        return self.answer_cache.report()
+
+    def known_answer(self, question: str):
+        """Returns the curated answer of a near-identical training question, or None."""
+        answer = self.question_index.lookup(question)
+        return self.infer_answer(answer) if answer is not None else None
+
+    def choose_option(self, question: str, options: list):
+        """Returns the option the model finds most likely for the question, always one of options."""
+        return self.choose_options([question], [options])[0]
+
+    def choose_options(self, questions: list, options_lists: list) -> list:
+        """Chooses an option for every question, questions not answered by the cache or router are
+           scored together in batches of at most max_batch_size questions."""
+        chosen = [None] * len(questions)
+        pending = []
+        for index, (question, options) in enumerate(zip(questions, options_lists)):
+            if not options:
+                continue
+            if len(options) == 1:
+                chosen[index] = options[0]
+                continue
+
+            cached_answer = self.answer_cache.get(self._options_cache_key(question, options))
+            if cached_answer in options:
+                chosen[index] = cached_answer
+                continue
+
+            routed_answer = self._route(question)
+            routed_options = [option for option in options
+                              if routed_answer is not None and option.strip().lower() == routed_answer.lower()]
+            if routed_options:
+                chosen[index] = routed_options[0]
+            else:
+                pending.append(index)
+
+        for start in range(0, len(pending), self.max_batch_size):
+            batch = pending[start:start + self.max_batch_size]
+            batch_questions = [questions[index] for index in batch]
+            batch_options = [options_lists[index] for index in batch]
+
+            if self.train_model:
+                best_options = [
+                    options[scores.argmax().item()]
+                    for options, scores in zip(batch_options, self._score_options(batch_questions, batch_options))
+                ]
+            else:
+                # Extractive pipeline can't score candidates, match its answer to the closest option
+                best_options = []
+                for options, prediction in zip(batch_options, self._predict_answers(batch_questions)):
+                    predicted_answer = self.infer_answer(str(prediction))
+                    best_options.append(max(options, key=lambda option: SequenceMatcher(
+                        None, predicted_answer.lower(), option.lower()).ratio()))
+
+            for index, best_option in zip(batch, best_options):
+                chosen[index] = best_option
+                self.answer_cache.put(self._options_cache_key(questions[index], options_lists[index]), best_option)
+
+        return chosen
+
+    @staticmethod
+    def _options_cache_key(question: str, options: list) -> str:
+        return f"{question} [options: {' | '.join(options)}]"
+
+    def _score_options(self, questions: list, options_lists: list) -> list:
+        """Scores every option by its mean token log-likelihood with teacher forcing. The encoder
+           runs once over all questions and every option shares one batched decoder pass."""
+        contexts = self.retriever.retrieve_many(questions)
+        inputs = self.tokenizer(
+            [f"question: {question}  context: {context}" for question, context in zip(questions, contexts)],
+            return_tensors="pt", padding=True
+        ).to(self.device)
+        flat_options = [option for options in options_lists for option in options]
+        labels = self.tokenizer(flat_options, return_tensors="pt", padding=True).input_ids.to(self.device)
+        labels[labels == self.tokenizer.pad_token_id] = -100
+        option_counts = tensor([len(options) for options in options_lists], device=self.device)
+
+        with no_grad():
+            encoder_hidden_state = self.model.get_encoder()(**inputs).last_hidden_state
+            logits = self.model(
+                encoder_outputs=BaseModelOutput(
+                    last_hidden_state=encoder_hidden_state.repeat_interleave(option_counts, dim=0)
+                ),
+                attention_mask=inputs.attention_mask.repeat_interleave(option_counts, dim=0),
+                labels=labels,
+            ).logits
+
+        label_mask = labels != -100
+        token_log_probs = logits.log_softmax(-1).gather(-1, labels.clamp(min=0).unsqueeze(-1)).squeeze(-1)
+        scores = (token_log_probs * label_mask).sum(-1) / label_mask.sum(-1)
+        return list(scores.split(option_counts.tolist()))
+
+    def _predict_answers(self, questions: list, max_length=5) -> list:
+        """Runs a single batched inference over the questions and returns raw predictions."""
+        contexts = self.retriever.retrieve_many(questions)
+        if self.train_model:
+            input_texts = [f"question: {question}  context: {context}"
+                           for question, context in zip(questions, contexts)]
+            inputs = self.tokenizer(input_texts, return_tensors="pt", padding=True).to(self.device)
+            outputs = self.model.generate(
+                inputs.input_ids, attention_mask=inputs.attention_mask, max_length=max_length
+            )
+            return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+        results = self.qa_model(
+            question=questions, context=contexts, batch_size=len(questions)
+        )
+        if isinstance(results, dict):
+            results = [results]
+        return [result['answer'] for result in results]
+
     def ask_question(self, question: str, max_length=5) -> str:
         """Asks a question and returns the inferred answer."""
         if question:
-            if self.train_model:
-                input_text = f"question: {question}  context: {SUMMARY_TEXT}"
-                input_ids = self.tokenizer(input_text, return_tensors="pt")
-                input_ids = input_ids.input_ids.to(self.device)
-                outputs = self.model.generate(input_ids, max_length=max_length)
-                predicted_answer = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            else:
-                result = self.qa_model(question=question, context=SUMMARY_TEXT)
-                predicted_answer = result['answer']
+            cached_answer = self.answer_cache.get(question)
+            if cached_answer is not None:
+                return cached_answer
+
+            routed_answer = self._route(question)
+            if routed_answer is not None:
+                return routed_answer
 
-            return self.infer_answer(str(predicted_answer))
+            predicted_answer = self._predict_answers([question], max_length)[0]
+            answer = self.infer_answer(str(predicted_answer))
+            self.answer_cache.put(question, answer)
+            return answer
 
-    def ask_multiple_questions(self, questions_list) -> list:
-        """Asks multiple questions and return the inferred answers."""
-        answers_list = []
-        for question in questions_list:
+    def ask_multiple_questions(self, questions_list, max_length=5) -> list:
+        """Asks multiple questions and return the inferred answers, questions not answered by
+           the cache or router are answered together in batches of at most max_batch_size."""
+        answers_list = [""] * len(questions_list)
+        pending = []
+        for index, question in enumerate(questions_list):
             if question:
-                answer = self.ask_question(question)
-                answers_list.append(answer)
-            else:
-                answers_list.append("")
+                answer = self.answer_cache.get(question)
+                if answer is None:
+                    answer = self._route(question)
+
+                if answer is not None:
+                    answers_list[index] = answer
+                else:
+                    pending.append(index)
+
+        for start in range(0, len(pending), self.max_batch_size):
+            batch = pending[start:start + self.max_batch_size]
+            predictions = self._predict_answers([questions_list[i] for i in batch], max_length)
+            for index, predicted_answer in zip(batch, predictions):
+                answers_list[index] = self.infer_answer(str(predicted_answer))
+                self.answer_cache.put(questions_list[index], answers_list[index])
 
         return answers_list
@@ -1,4 +1,4 @@
-from math import sqrt
+from typing import TYPE_CHECKING
 
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.common.by import By
@@ -7,27 +7,60 @@ from selenium.webdriver.support import expected_conditions as ec
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.common.exceptions import ElementClickInterceptedException
 
-from model import QuestionAnsweringModel
 from config import JOB_APPLY_TARGET
+from config import CRAWL_MAX_PAGES, CRAWL_MAX_TABS, CRAWL_TITLE_KEYWORDS, CRAWL_DEPTH_PENALTY
 from job_logger import log_applied_job, total_jobs_log
-from extract_and_fill import NaukriDotComExtractAndFill
+from timing import StageTimer
+from crawl_frontier import CrawlFrontier
+from page_scripts import extract_job_info, job_listings_of
+from tab_pool import TabPool
+from seen_jobs import SeenJobIndex, job_id_from_url, APPLIED, FAILED, SKIPPED
+from extract_and_fill import NaukriDotComExtractAndFill, skill_table
+
+if TYPE_CHECKING:
+    from model import QuestionAnsweringModel
 
 DEFAULT_LINK = "https://www.naukri.com/mnjuser/recommendedjobs"
 MAXIMUM_TRIES = 2
+SITE_NAME = "naukri"
+JOB_ID_ATTRIBUTES = ["data-job-id"]
+JOB_ID_URL_PATTERN = r"-(\d{6,})(?:[?#/]|$)"
+# Naukri redirects job-listings-<id> to the posting, used for cards without a link
+JOB_URL_TEMPLATE = "https://www.naukri.com/job-listings-{job_id}"
+JOB_TITLE_SELECTOR = "a.title, .title, h2, h3"
+JOB_INFO_ANCHOR = "div#root section#job_header h1"
+JOB_INFO_FIELDS = {
+    "job_position": {"selector": "div#root section#job_header h1"},
+    "company_name": {"selector": "div#root section#job_header a"},
+    "experience_level": {"selector": "div#root section#job_header div.styles_jhc__exp__k_giM"},
+    "salary": {"selector": "div#root section#job_header div.styles_jhc__salary__jdfEC"},
+    "job_location": {
+        "selector": "div#root section#job_header span.styles_jhc__location__W_pVs a", "all": True, "join": ", "
+    },
+}
+
+
+def job_relevance(title: str, text: str) -> float:
+    """Keywords in the title count double, profile skills anywhere on the job card count once"""
+    title = title.lower()
+    return (2 * sum(keyword in title for keyword in CRAWL_TITLE_KEYWORDS)
+            + len(skill_table.find_skills(f"{title} {text}")))
 
 
 class NaukriDotComApply:
-    def __init__(self, driver: WebDriver, model: QuestionAnsweringModel, link=None):
+    def __init__(self, driver: WebDriver, model: "QuestionAnsweringModel", link=None,
+                 seen_jobs: SeenJobIndex = None):
         """Naukri.com class to apply to all naukri jobs through Selenium webdriver"""
         self.driver = driver
         self.model = model
+        self.seen_jobs = seen_jobs or SeenJobIndex()
         self.job_info = dict()
-        self.all_articles = []
+        self.frontier = CrawlFrontier(CRAWL_MAX_PAGES, CRAWL_MAX_TABS, JOB_APPLY_TARGET, CRAWL_DEPTH_PENALTY)
         self.all_jobs_count = 0
         self.jobs_traversed = 0
         self.jobs_applied = 0
         self.job_apply_failed_count = 0
-        self.apply_target = int(sqrt(min(JOB_APPLY_TARGET, 225)))
+        self.timer = StageTimer()
         self.link = DEFAULT_LINK if not link else link
         self.driver.get(self.link)
         if self.driver.current_url != self.link:
@@ -61,79 +94,69 @@ class NaukriDotComApply:
                     break
 
     def apply_recommended_jobs(self) -> None:
-        """Extracts limited job postings from the recommended job page."""
-        while JOB_APPLY_TARGET >= self.jobs_applied:
-            jobs_css_pass = ("div.recommended-jobs-page div.list article"
-                             if self.link == DEFAULT_LINK else "article")
-            try:
+        """Crawls job postings from the recommended job page, most relevant first, until the
+           page, tab and application budgets are spent or no new job is listed."""
+        jobs_css_pass = ("div.recommended-jobs-page div.list article"
+                         if self.link == DEFAULT_LINK else "article")
+        tab_pool = TabPool(self.driver, CRAWL_MAX_TABS)
+        try:
+            while True:
                 articles = WebDriverWait(self.driver, 5).until(
                     ec.presence_of_all_elements_located(
                         (By.CSS_SELECTOR, jobs_css_pass)
                     )
                 )
                 self.all_jobs_count += len(articles)
-                articles = articles[0:min(self.apply_target, len(articles))]
+                if not self._queue_jobs(articles, depth=0):
+                    print("SUCCESS: Every listed job was already visited, applied or skipped.")
+                    break
 
-                self.all_articles.extend(
-                    [article for article in articles if article not in self.all_articles]
-                )
-                original_tab = self.driver.current_window_handle
-                self._dfs_job_traversal(articles, original_tab)
+                while batch := self.frontier.pop_batch(self.jobs_applied):
+                    self._visit_jobs(batch, tab_pool)
+                if len(self.frontier):
+                    break  # Budget spent with jobs left in the frontier
                 self.driver.get(self.link)
 
-            except TimeoutException:
-                print("ERROR: No job elements found! Exiting.")
-                break
-            except Exception as e:
-                print("ERROR:", e)
-                break
+        except TimeoutException:
+            print("ERROR: No job elements found! Exiting.")
+        except Exception as e:
+            print("ERROR:", e)
+        finally:
+            tab_pool.close()
 
         total_jobs_log(
             self.all_jobs_count,
-            len(self.all_articles),
+            self.frontier.pages_opened,
             self.jobs_applied,
             self.jobs_traversed,
             "NaukriDotCom"
         )
-
-    def _dfs_job_traversal(self, articles, parent_tab, depth=1) -> None:
-        """Recursively traverses job postings(DFS), applying jobs, limited depth."""
-        if depth > self.apply_target:
-            return
-
-        for i, article in enumerate(articles):
+        print(self.timer.report("NaukriDotCom application timings"))
+        print(self.seen_jobs.report())
+        print(self.frontier.report())
+
+    def _visit_jobs(self, batch, tab_pool: TabPool) -> None:
+        """Loads a batch of job pages at once in the pool tabs, then queues the jobs listed
+           on each page and applies, releasing every tab for the next batch."""
+        depths = {job["job_id"]: job["depth"] for job in batch}
+        for tab in tab_pool.open([job["url"] for job in batch]):
+            self.driver.switch_to.window(tab)
             try:
-                original_tabs = self.driver.window_handles
-                article.click()
-
-                WebDriverWait(self.driver, 5).until(
-                    ec.number_of_windows_to_be(len(original_tabs) + 1))
-
-                new_tab = [
-                    tab for tab in self.driver.window_handles
-                    if tab not in original_tabs
-                ][0]
-                self.driver.switch_to.window(new_tab)
-
                 WebDriverWait(self.driver, 5).until(
                     ec.presence_of_element_located((By.CSS_SELECTOR, "div#root"))
                 )
-                new_page_articles = self._get_all_articles_on_page()
-
-                if new_page_articles and depth < self.apply_target:
-                    self._dfs_job_traversal(
-                        new_page_articles, new_tab, depth + 1
-                    )
+                job_id = job_id_from_url(self.driver.current_url, JOB_ID_URL_PATTERN)
+                depth = depths.get(job_id, max(depths.values()))
+                self._queue_jobs(self._get_all_articles_on_page(), depth + 1)
                 self.apply_to_job()
 
             except (TimeoutException, ElementClickInterceptedException):
                 pass
 
-            self.driver.close()
-            self.driver.switch_to.window(parent_tab)
+            tab_pool.release(tab)
 
     def _get_all_articles_on_page(self) -> list:
-        """Scrapes and returns limited list of article elements on the current page."""
+        """Returns the article elements on the current page."""
         try:
             articles = WebDriverWait(self.driver, 5).until(
                 ec.presence_of_all_elements_located(
@@ -141,20 +164,35 @@ class NaukriDotComApply:
                 )
             )
             self.all_jobs_count += len(articles)
-
-            filtered_articles = []
-            for article in articles[0:min(self.apply_target, len(articles))]:
-                if article not in self.all_articles:
-                    filtered_articles.append(article)
-                    self.all_articles.append(article)
-            return filtered_articles
+            return articles
 
         except TimeoutException:
             return []
 
+    def _queue_jobs(self, articles, depth: int) -> int:
+        """Queues jobs not handled before by relevance, returns how many were new"""
+        listings = job_listings_of(self.driver, articles, JOB_ID_ATTRIBUTES, JOB_ID_URL_PATTERN, JOB_TITLE_SELECTOR)
+        queued = 0
+        for listing in listings:
+            job_id = listing["jobId"]
+            if self.seen_jobs.is_done(SITE_NAME, job_id):
+                continue
+            url = listing["url"] or (JOB_URL_TEMPLATE.format(job_id=job_id) if job_id else None)
+            queued += self.frontier.push(job_id, url, job_relevance(listing["title"], listing["text"]), depth)
+        return queued
+
     def apply_to_job(self) -> None:
         """Apply to the current job posting and its verification"""
-        self._get_job_info()
+        application_timer = StageTimer()
+        try:
+            self._apply_to_job(application_timer)
+        finally:
+            self.timer.merge(application_timer)
+
+    def _apply_to_job(self, application_timer: StageTimer) -> None:
+        job_id = job_id_from_url(self.driver.current_url, JOB_ID_URL_PATTERN)
+        with application_timer.stage("job info"):
+            self._get_job_info()
 
         try:
             reference_element = WebDriverWait(self.driver, 2).until(
@@ -175,48 +213,26 @@ class NaukriDotComApply:
                     )
                     applied = True
                 except (TimeoutException, NoSuchElementException):
-                    naukri_apply = NaukriDotComExtractAndFill(self.driver, self.model)
+                    naukri_apply = NaukriDotComExtractAndFill(self.driver, self.model, application_timer)
                     applied = naukri_apply.parse_questions_and_answers()
 
                 if applied:
                     print(f'SUCCESS: Successfully applied for {self.job_info["job_position"]}'
                           f' at {self.job_info["company_name"]}.')
+                    print(f"Application timings: {application_timer.summary()}")
                     log_applied_job(self.job_info, "Naukridotcom")
                     self.jobs_applied += 1
+                    self.seen_jobs.mark(SITE_NAME, job_id, APPLIED)
                 else:
                     self.jobs_traversed += 1
+                    self.seen_jobs.mark(SITE_NAME, job_id, FAILED)
 
         except TimeoutException:
-            pass
+            # No apply button, the job is applied on the company site
+            self.seen_jobs.mark(SITE_NAME, job_id, SKIPPED)
 
     def _get_job_info(self) -> None:
-        job_position_cname_exp_salary_css_paths = {
-            "job_position": "div#root section#job_header h1",
-            "company_name": "div#root section#job_header a",
-            "experience_level": "div#root section#job_header div.styles_jhc__exp__k_giM",
-            "salary": "div#root section#job_header div.styles_jhc__salary__jdfEC",
-            "job_location": "div#root section#job_header span.styles_jhc__location__W_pVs a",
-        }
-        for info_name, path in job_position_cname_exp_salary_css_paths.items():
-            if info_name == "job_location":
-                break
-            try:
-                info = WebDriverWait(self.driver, 1).until(
-                    ec.presence_of_element_located((By.CSS_SELECTOR, path))
-                ).text
-            except TimeoutException:
-                info = None
-            self.job_info[info_name] = info
-
-        try:
-            job_location_elements = WebDriverWait(self.driver, 1).until(
-                ec.presence_of_all_elements_located(
-                    (By.CSS_SELECTOR, job_position_cname_exp_salary_css_paths["job_location"]))
-            )
-            job_location = [location_element.text for location_element in job_location_elements]
-        except TimeoutException:
-            job_location = []
-        self.job_info["job_location"] = ', '.join(job_location) if job_location else None
+        self.job_info = extract_job_info(self.driver, JOB_INFO_ANCHOR, JOB_INFO_FIELDS)
 
     def _check_failed_apply_error(self) -> bool:
         try:
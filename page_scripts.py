@@ -0,0 +1,251 @@
+# Scripts run inside the page with execute_script, each one replaces many WebDriver round trips
+
+# arguments[0] is the Easy Apply dialog, arguments[1] the form section class found on an earlier step.
+# Returns the section class and, for every form section, the question label, the field kind,
+# the option labels and the elements to fill them with. Elements come back as WebElements.
+LINKEDIN_FORM_SNAPSHOT = """
+const dialog = arguments[0];
+let sectionClass = arguments[1];
+const text = element => element ? element.innerText.trim() : "";
+
+if (!sectionClass || !dialog.getElementsByClassName(sectionClass).length) {
+    const classCount = {};
+    for (const div of dialog.getElementsByTagName("div")) {
+        const className = (div.getAttribute("class") || "").trim();
+        if (className.length > 30 && className.length < 40) {
+            classCount[className] = (classCount[className] || 0) + 1;
+        }
+    }
+    sectionClass = Object.keys(classCount).find(name => classCount[name] >= 2) || null;
+}
+if (!sectionClass) {
+    return {sectionClass: null, fields: []};
+}
+
+const fields = [];
+for (const section of dialog.getElementsByClassName(sectionClass)) {
+    const fieldset = section.querySelector("fieldset[data-test-form-builder-radio-button-form-component]");
+    const select = section.querySelector("select[data-test-text-entity-list-form-select]");
+    const checkboxes = section.querySelectorAll("input[type='checkbox']");
+    const input = section.querySelector("input[type='text']");
+
+    if (fieldset) {
+        const labels = Array.from(fieldset.getElementsByTagName("label"));
+        fields.push({kind: "radio", label: text(section.querySelector("legend")),
+                     options: labels.map(text), elements: labels});
+    } else if (select) {
+        const options = Array.from(select.options).filter(option => option.getAttribute("value"));
+        fields.push({kind: "select", label: text(section.querySelector("label")),
+                     options: options.map(option => option.text.trim()), elements: [select]});
+    } else if (checkboxes.length) {
+        const labels = Array.from(checkboxes)
+            .map(checkbox => {
+                let label = checkbox.nextElementSibling;
+                while (label && label.tagName !== "LABEL") label = label.nextElementSibling;
+                return label;
+            })
+            .filter(label => label);
+        fields.push({kind: "checkbox", label: text(section.querySelector("legend")),
+                     options: labels.map(text), elements: labels});
+    } else if (input) {
+        fields.push({kind: "text", label: text(section.querySelector("label")), options: [],
+                     elements: [input],
+                     typeahead: input.getAttribute("role") === "combobox"
+                         || input.hasAttribute("aria-autocomplete")});
+    }
+}
+return {sectionClass: sectionClass, fields: fields};
+"""
+
+# arguments[0] is a list of [element, action, value] fills. Values are set through the native
+# setters and input/change events are dispatched so the page's framework registers them.
+# Returns the indices of the fills that could not be applied, those are filled one by one.
+BULK_FILL = """
+const failed = [];
+const setNativeValue = (element, value) => {
+    const prototype = element instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype
+        : element instanceof HTMLSelectElement ? HTMLSelectElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(prototype, "value").set.call(element, value);
+    element.dispatchEvent(new Event("input", {bubbles: true}));
+    element.dispatchEvent(new Event("change", {bubbles: true}));
+};
+
+arguments[0].forEach(([element, action, value], index) => {
+    try {
+        if (!element || !element.isConnected) {
+            failed.push(index);
+        } else if (action === "click") {
+            element.click();
+        } else if (action === "check") {
+            const checkbox = element.htmlFor ? document.getElementById(element.htmlFor) : null;
+            if (!checkbox || !checkbox.checked) element.click();
+        } else if (action === "select") {
+            const option = Array.from(element.options).find(option => option.text.trim() === value);
+            if (option) setNativeValue(element, option.value); else failed.push(index);
+        } else if (action === "type") {
+            element.focus();
+            setNativeValue(element, String(value));
+            element.blur();
+        } else {
+            failed.push(index);
+        }
+    } catch (error) {
+        failed.push(index);
+    }
+});
+return failed;
+"""
+
+# Async script, arguments are the bot message count to wait for and a timeout in milliseconds.
+# A MutationObserver resolves as soon as that many bot messages are shown and the last one has
+# its input container, and returns the question with its field in the same call. On timeout
+# whatever the last message has is returned, or null if there is no chatbot.
+NAUKRI_CHATBOT_QUESTION = """
+const [minimumCount, timeout, done] = arguments;
+const text = element => element ? element.innerText.trim() : "";
+
+const readQuestion = force => {
+    const drawer = document.querySelector("div.chatbot_DrawerContentWrapper");
+    const items = drawer ? drawer.querySelectorAll("li.botItem.chatbot_ListItem") : [];
+    if (!items.length || (!force && items.length < minimumCount)) return null;
+
+    const question = items[items.length - 1];
+    const turn = {question: text(question), count: items.length, drawer: drawer,
+                  kind: null, options: [], elements: []};
+    if (turn.question.replace(/[^a-zA-Z]/g, "").toLowerCase() === "thankyouforyourresponses") {
+        turn.kind = "finished";
+        return turn;
+    }
+
+    const answer = question.parentElement ? question.parentElement.nextElementSibling : null;
+    const textArea = answer ? answer.querySelector("div.textArea") : null;
+    const radios = answer ? answer.querySelector("div.singleselect-radiobutton-container") : null;
+    const input = answer ? answer.querySelector("input[type='text']") || drawer.querySelector("input[type='text']") : null;
+
+    if (textArea) {
+        Object.assign(turn, {kind: "textarea", elements: [textArea]});
+    } else if (radios) {
+        const labels = Array.from(radios.querySelectorAll("div.ssrc__radio-btn-container label"));
+        Object.assign(turn, {kind: "radio", options: labels.map(text), elements: labels});
+    } else if (input) {
+        const suggestions = Array.from(answer.querySelectorAll("div.ssc__wrapper"));
+        Object.assign(turn, {kind: "text", options: suggestions.map(text), elements: [input, ...suggestions]});
+    } else if (!force) {
+        return null;
+    }
+    return turn;
+};
+
+const turn = readQuestion(false);
+if (turn) {
+    done(turn);
+} else {
+    const observer = new MutationObserver(() => {
+        const turn = readQuestion(false);
+        if (turn) {
+            observer.disconnect();
+            clearTimeout(timer);
+            done(turn);
+        }
+    });
+    const timer = setTimeout(() => {
+        observer.disconnect();
+        done(readQuestion(true));
+    }, timeout);
+    observer.observe(document.body, {childList: true, subtree: true});
+}
+"""
+
+# Async script, arguments are the top card selector, a field map and a timeout in milliseconds.
+# Waits once for the top card and reads every field, missing fields are null. A field is
+# {"selector": css} and may set "all" to join every match with "join", or "split" to keep
+# only the text before the first separator.
+JOB_INFO = """
+const [anchor, fields, timeout, done] = arguments;
+
+const readFields = () => {
+    const info = {};
+    for (const [name, field] of Object.entries(fields)) {
+        const elements = field.all ? Array.from(document.querySelectorAll(field.selector))
+                                   : [document.querySelector(field.selector)].filter(Boolean);
+        let value = elements.map(element => element.innerText.trim()).filter(Boolean).join(field.join || ", ");
+        if (value && field.split) value = value.split(field.split)[0].trim();
+        info[name] = value || null;
+    }
+    return info;
+};
+
+if (document.querySelector(anchor)) {
+    done(readFields());
+} else {
+    const observer = new MutationObserver(() => {
+        if (document.querySelector(anchor)) {
+            observer.disconnect();
+            clearTimeout(timer);
+            done(readFields());
+        }
+    });
+    const timer = setTimeout(() => {
+        observer.disconnect();
+        done(readFields());
+    }, timeout);
+    observer.observe(document.documentElement, {childList: true, subtree: true});
+}
+"""
+
+# arguments[0] are job list elements, arguments[1] the attributes that hold a job id, checked on
+# the element and its descendants, arguments[2] a regex whose first group is the id in a link, and
+# arguments[3] the title selector. Returns the job id (from the attributes, else the first matching
+# link), the posting url, the title, and the start of the card text of every job list element.
+JOB_LISTINGS = """
+const [elements, attributes, urlPattern, titleSelector] = arguments;
+const pattern = new RegExp(urlPattern);
+return elements.map(element => {
+    let jobId = null, url = null;
+    for (const attribute of attributes) {
+        const holder = element.hasAttribute(attribute) ? element : element.querySelector(`[${attribute}]`);
+        if (holder && holder.getAttribute(attribute)) {
+            jobId = holder.getAttribute(attribute);
+            break;
+        }
+    }
+    for (const link of element.querySelectorAll("a[href]")) {
+        const match = link.href.match(pattern);
+        if (match) {
+            url = link.href;
+            jobId = jobId || match[1];
+            break;
+        }
+    }
+    const title = element.querySelector(titleSelector);
+    return {jobId: jobId, url: url, title: title ? title.innerText.trim() : "",
+            text: element.innerText.trim().slice(0, 500)};
+});
+"""
+
+
+def snapshot_linkedin_form(apply_box_element, section_class=None) -> dict:
+    """Reads every question of the Easy Apply dialog in one round trip"""
+    return apply_box_element.parent.execute_script(LINKEDIN_FORM_SNAPSHOT, apply_box_element, section_class)
+
+
+def bulk_fill(driver, fills: list) -> list:
+    """Applies [element, action, value] fills in one round trip, returns indices that failed"""
+    return driver.execute_script(BULK_FILL, fills) if fills else []
+
+
+def wait_for_chatbot_question(driver, minimum_count=1, timeout=5):
+    """Waits in the page for the next Naukri chatbot question and returns it with its field"""
+    return driver.execute_async_script(NAUKRI_CHATBOT_QUESTION, minimum_count, int(timeout * 1000))
+
+
+def extract_job_info(driver, anchor: str, fields: dict, timeout=5) -> dict:
+    """Reads all job fields in one call once the top card matched by anchor is shown"""
+    return driver.execute_async_script(JOB_INFO, anchor, fields, int(timeout * 1000))
+
+
+def job_listings_of(driver, elements: list, attributes: list, url_pattern: str, title_selector: str) -> list:
+    """Reads id, url, title and card text of every job list element in one round trip"""
+    if not elements:
+        return []
+    return driver.execute_script(JOB_LISTINGS, elements, attributes, url_pattern, title_selector)
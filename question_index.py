@@ -0,0 +1,95 @@
+import re
+import pickle
+import hashlib
+from os import path, makedirs
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from skill_table import YEARS_QUESTION, YES_NO_QUESTION
+
+# Bumped when the saved index layout changes, so older index files are rebuilt
+INDEX_FORMAT = 2
+WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+
+def question_words(question: str) -> set:
+    return set(WORD_PATTERN.findall(question.lower()))
+
+
+def conflicts_with(question: str, answer) -> bool:
+    """True if the answer's kind doesn't fit the question, a number for a yes/no question
+       or Yes/No for a how many/how much question"""
+    words = str(answer).split()
+    first_word = words[0].strip(",.") if words else ""
+    if first_word in ("Yes", "No"):
+        return bool(YEARS_QUESTION.search(question))
+    if first_word.isdigit():
+        return bool(YES_NO_QUESTION.match(question))
+    return False
+
+
+class QuestionIndex:
+    def __init__(self, questions: list, answers: list, index_path=None, threshold=0.85) -> None:
+        """Character n-gram TF-IDF index over the curated training questions, loaded from
+           index_path when it was built from the same questions and answers"""
+        self.threshold = threshold
+        self.data_hash = hashlib.sha256(repr((INDEX_FORMAT, questions, answers)).encode()).hexdigest()
+
+        if not (index_path and self._load(index_path)):
+            self.answers = list(answers)
+            self.question_words = [question_words(question) for question in questions]
+            self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True)
+            self.question_vectors = self.vectorizer.fit_transform(
+                [" ".join(question.split()) for question in questions]
+            )
+            if index_path:
+                self._save(index_path)
+
+    def _load(self, index_path) -> bool:
+        if not path.isfile(index_path):
+            return False
+        try:
+            with open(index_path, "rb") as file:
+                saved_index = pickle.load(file)
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            return False
+
+        if saved_index.get("data_hash") != self.data_hash:
+            return False
+
+        self.answers = saved_index["answers"]
+        self.question_words = saved_index["question_words"]
+        self.vectorizer = saved_index["vectorizer"]
+        self.question_vectors = saved_index["question_vectors"]
+        return True
+
+    def _save(self, index_path) -> None:
+        if not path.exists(path.dirname(index_path)):
+            makedirs(path.dirname(index_path))
+
+        with open(index_path, "wb") as file:
+            pickle.dump({
+                "data_hash": self.data_hash,
+                "answers": self.answers,
+                "question_words": self.question_words,
+                "vectorizer": self.vectorizer,
+                "question_vectors": self.question_vectors,
+            }, file)
+
+    def lookup(self, question: str):
+        """Returns the answer of the most similar indexed question if it passes the threshold,
+           uses no word the indexed question lacks, and the answer fits the question's shape"""
+        if not question or not question.strip():
+            return None
+
+        # TF-IDF rows are L2 normalized, so the dot product is the cosine similarity
+        scores = (self.vectorizer.transform([" ".join(question.split())]) @ self.question_vectors.T).toarray()[0]
+        best = scores.argmax()
+        if scores[best] < self.threshold:
+            return None
+        # Characters alone can't tell "MySQL" from "SQL" or "How much experience" from "Do you have experience"
+        if not question_words(question) <= self.question_words[best]:
+            return None
+        if conflicts_with(question, self.answers[best]):
+            return None
+        return self.answers[best]
@@ -0,0 +1,76 @@
+import re
+import sqlite3
+from time import time
+from threading import Lock
+from os import path, makedirs
+
+from config import SEEN_JOBS_PATH, SEEN_JOBS_RETRY_FAILED_AFTER
+
+APPLIED, SAVED, FAILED, SKIPPED = "applied", "saved", "failed", "skipped"
+JOB_STATES = (APPLIED, SAVED, FAILED, SKIPPED)
+
+
+def job_id_from_url(url: str, pattern: str):
+    """Returns the first group of pattern found in the url, or None"""
+    match = re.search(pattern, url or "")
+    return match.group(1) if match else None
+
+
+class SeenJobIndex:
+    def __init__(self, db_path=SEEN_JOBS_PATH, retry_failed_after=SEEN_JOBS_RETRY_FAILED_AFTER) -> None:
+        """On-disk index of job ids already handled per site. All rows are kept in a dict so
+           filtering a job list is O(1) per job, every change is written through to SQLite."""
+        self.retry_failed_after = retry_failed_after
+        self.lookups = 0
+        self.hits = 0
+        self.lock = Lock()
+
+        if db_path != ":memory:" and path.dirname(db_path) and not path.exists(path.dirname(db_path)):
+            makedirs(path.dirname(db_path))
+
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS seen_jobs ("
+                "site TEXT NOT NULL, job_id TEXT NOT NULL, state TEXT NOT NULL, "
+                "updated REAL NOT NULL, PRIMARY KEY (site, job_id))"
+            )
+        self.jobs = {
+            (site, job_id): (state, updated)
+            for site, job_id, state, updated in self.connection.execute(
+                "SELECT site, job_id, state, updated FROM seen_jobs"
+            )
+        }
+
+    def is_done(self, site: str, job_id) -> bool:
+        """True if the job should not be opened again, failed jobs are retried after a while"""
+        if not job_id:
+            return False
+
+        self.lookups += 1
+        entry = self.jobs.get((site, str(job_id)))
+        done = bool(entry) and (entry[0] != FAILED or time() - entry[1] < self.retry_failed_after)
+        self.hits += done
+        return done
+
+    def mark(self, site: str, job_id, state: str) -> None:
+        if not job_id:
+            return
+        if state not in JOB_STATES:
+            raise ValueError(f"Unknown job state: {state}")
+
+        key, updated = (site, str(job_id)), time()
+        with self.lock, self.connection:
+            self.jobs[key] = (state, updated)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO seen_jobs (site, job_id, state, updated) VALUES (?, ?, ?, ?)",
+                (*key, state, updated)
+            )
+
+    def report(self) -> str:
+        hit_ratio = self.hits / self.lookups if self.lookups else 0.0
+        return (f"Seen jobs: {len(self.jobs)} indexed, {self.hits}/{self.lookups} "
+                f"listed jobs skipped ({hit_ratio:.1%})")
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,61 @@
+import json
+from os import path, replace
+from time import time
+
+from config import SELECTOR_CACHE_PATH, SELECTOR_CACHE_TTL
+
+
+class SelectorCache:
+    def __init__(self, cache_path=SELECTOR_CACHE_PATH, ttl=SELECTOR_CACHE_TTL) -> None:
+        """Remembers learned class names and the last winning locator per site and page type
+           across jobs and runs. Entries older than ttl seconds are learned again."""
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.entries = {}
+
+        if cache_path and path.isfile(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    @staticmethod
+    def _key(site: str, page_type: str) -> str:
+        return f"{site}/{page_type}"
+
+    def get(self, site: str, page_type: str):
+        """Returns the cached selector, or None if it is missing or expired"""
+        entry = self.entries.get(self._key(site, page_type))
+        if entry and time() - entry["saved"] < self.ttl:
+            return entry["selector"]
+        return None
+
+    def put(self, site: str, page_type: str, selector) -> None:
+        key = self._key(site, page_type)
+        entry = self.entries.get(key)
+        if entry and entry["selector"] == selector and time() - entry["saved"] < self.ttl:
+            return
+
+        self.entries[key] = {"selector": selector, "saved": time()}
+        self._save()
+
+    def invalidate(self, site: str, page_type: str) -> None:
+        if self.entries.pop(self._key(site, page_type), None) is not None:
+            self._save()
+
+    def ordered(self, site: str, page_type: str, paths: list) -> list:
+        """Returns the fallback paths with the last winning one first"""
+        winner = self.get(site, page_type)
+        return sorted(paths, key=lambda candidate: candidate != winner)
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self.entries, file, indent=2)
+            replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"ERROR: Could not save selector cache: {e}")
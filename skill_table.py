@@ -0,0 +1,117 @@
+import re
+
+YEARS_PATTERN = re.compile(
+    r"\bI have (\d+) years? of (?:work )?experience (?:do you have |familiar )?"
+    r"(?:with in|with|in|as an?) (.+)$", re.IGNORECASE
+)
+FAMILIAR_PATTERN = re.compile(
+    r"\b(?:I am familiar with|I know|I have work experience (?:with in|with|in)) (.+)$", re.IGNORECASE
+)
+RATING_PATTERN = re.compile(r"\bI would rate me (\d+) on\b", re.IGNORECASE)
+
+RATING_QUESTION = re.compile(r"\brate\b|\brating\b", re.IGNORECASE)
+YEARS_QUESTION = re.compile(r"\bhow (?:many|much)\b", re.IGNORECASE)
+# Field labels like "Flask years" or "Experience in Python" ask for a number, without a question mark
+YEARS_LABEL = re.compile(r"\byears?\b|\bexperience\b", re.IGNORECASE)
+YES_NO_QUESTION = re.compile(
+    r"^\W*(?:do|does|did|are|is|have|has|can|could|will|would)\b", re.IGNORECASE
+)
+REQUIRED_YEARS = re.compile(r"(\d+)\s*\+?\s*years?\b", re.IGNORECASE)
+FAMILIAR_QUESTION = re.compile(
+    r"familiar|\bknow|\bexperience\b|\bproficien|\bworked\b|\bskilled\b", re.IGNORECASE
+)
+
+
+def normalize_skill(name: str) -> str:
+    return " ".join(name.lower().strip(" .,?").split())
+
+
+def split_skills(text: str) -> list:
+    """Splits a listed skills phrase, 'like Python Java C++' lists are separated by spaces only"""
+    text = re.split(r"\.\s|\band Yes\b", text)[0]
+    if " like " in text:
+        return [skill for skill in re.split(r",|\band\b|\s+", text.split(" like ", 1)[1]) if skill.strip()]
+    return [skill for skill in re.split(r",|\band\b", text) if skill.strip()]
+
+
+class SkillTable:
+    def __init__(self, summary_text: str, aliases=None) -> None:
+        """Compiles the profile summary once into skill -> years of experience / familiarity,
+           and answers experience, rating, and familiarity questions straight from it"""
+        self.years = {}
+        self.familiar = set()
+        self.rating = None
+        self.aliases = {}
+
+        for sentence in re.split(r"(?<=[.!?])\s+", " ".join(summary_text.split())):
+            self._compile_sentence(sentence.strip(" ."))
+
+        for skill, skill_aliases in (aliases or {}).items():
+            for alias in skill_aliases:
+                self.aliases[normalize_skill(alias)] = normalize_skill(skill)
+
+        # One alternation, longest names first, so "javascript" wins over "java". A dot joined to a
+        # word is part of the name, so "js" doesn't match in "node.js" nor "python" in "python.org"
+        names = sorted(self.familiar | set(self.aliases), key=len, reverse=True)
+        self.skill_pattern = re.compile(
+            r"(?<![\w+#.])(" + "|".join(re.escape(name) for name in names) + r")(?![\w+#]|\.\w)"
+        ) if names else None
+
+    def _compile_sentence(self, sentence: str) -> None:
+        if rating_match := RATING_PATTERN.search(sentence):
+            self.rating = rating_match.group(1)
+            return
+
+        if years_match := YEARS_PATTERN.search(sentence):
+            years, skills = int(years_match.group(1)), split_skills(years_match.group(2))
+        elif familiar_match := FAMILIAR_PATTERN.search(sentence):
+            years, skills = None, split_skills(familiar_match.group(1))
+        else:
+            return
+
+        for skill in skills:
+            # "ETL [Extract Transform Load]" is indexed under both names
+            for name in re.split(r"[\[\]]", skill):
+                name = normalize_skill(name)
+                if not name or "anything" in name:
+                    continue
+                self.familiar.add(name)
+                if years is not None:
+                    self.years[name] = max(years, self.years.get(name, 0))
+
+    def find_skills(self, question: str) -> list:
+        if not self.skill_pattern:
+            return []
+        return list(dict.fromkeys(
+            self.aliases.get(name, name) for name in self.skill_pattern.findall(question.lower())
+        ))
+
+    def answer(self, question: str):
+        """Returns the answer from the table, or None when the question isn't about a known skill"""
+        skills = [skill for skill in self.find_skills(question) if skill in self.familiar]
+        if not skills:
+            return None
+
+        if RATING_QUESTION.search(question):
+            return self.rating
+
+        years = [self.years[skill] for skill in skills if skill in self.years]
+        if YES_NO_QUESTION.match(question):
+            # "Do you have 5+ years of experience in Python?" is answered Yes or No
+            if required_years := REQUIRED_YEARS.search(question):
+                return ("Yes" if max(years) >= int(required_years.group(1)) else "No") if years else None
+        elif YEARS_QUESTION.search(question) or ("?" not in question and YEARS_LABEL.search(question)):
+            return str(max(years)) if years else None
+
+        if FAMILIAR_QUESTION.search(question):
+            return "Yes"
+        return None
+
+    def disagreements(self, questions: list, answers: list) -> list:
+        """Returns (question, table answer, curated answer) for every question the table answers
+           differently from the curated answers"""
+        return [
+            (question, table_answer, str(answer).strip())
+            for question, answer in zip(questions, answers)
+            if (table_answer := self.answer(question)) is not None and table_answer != str(answer).strip()
+        ]
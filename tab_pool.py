@@ -0,0 +1,65 @@
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.common.exceptions import WebDriverException
+
+from config import TAB_POOL_MAX_USES
+
+
+class TabPool:
+    def __init__(self, driver: WebDriver, size: int, max_uses=TAB_POOL_MAX_USES) -> None:
+        """Long-lived tabs that are navigated to the next job page instead of being opened and
+           closed for every job. A tab is replaced after max_uses jobs to bound its memory."""
+        self.driver = driver
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.home = driver.current_window_handle
+        self.tabs = {}
+
+    def open(self, urls: list) -> list:
+        """Starts loading up to size urls at once, each in its own pool tab, and returns the
+           tabs in the same order. Tabs are only created when the pool is smaller than needed."""
+        urls = urls[:self.size]
+        while len(self.tabs) < len(urls):
+            self.driver.switch_to.new_window("tab")
+            self.tabs[self.driver.current_window_handle] = 0
+
+        tabs = list(self.tabs)[:len(urls)]
+        for tab, url in zip(tabs, urls):
+            self.driver.switch_to.window(tab)
+            # Unlike get, assigning the location doesn't wait for the load, so all tabs load together
+            self.driver.execute_script("window.location.href = arguments[0];", url)
+        self.driver.switch_to.window(self.home)
+        return tabs
+
+    def release(self, tab: str) -> None:
+        """Resets the tab for the next job, or closes it once it served max_uses jobs,
+           and switches back to the tab the pool was created from"""
+        self.tabs[tab] += 1
+        try:
+            self.driver.switch_to.window(tab)
+            if self.tabs[tab] >= self.max_uses:
+                self._close_tab(tab)
+            else:
+                self.driver.execute_script("try { sessionStorage.clear(); } catch (e) {}")
+                self.driver.get("about:blank")
+        except WebDriverException:
+            # A page that refused to unload is closed instead of reused
+            self.tabs.pop(tab, None)
+            try:
+                self.driver.close()
+            except WebDriverException:
+                pass
+
+        self.driver.switch_to.window(self.home)
+
+    def _close_tab(self, tab: str) -> None:
+        del self.tabs[tab]
+        self.driver.close()
+
+    def close(self) -> None:
+        for tab in list(self.tabs):
+            try:
+                self.driver.switch_to.window(tab)
+                self._close_tab(tab)
+            except WebDriverException:
+                self.tabs.pop(tab, None)
+        self.driver.switch_to.window(self.home)
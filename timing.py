@@ -0,0 +1,47 @@
+from time import perf_counter
+from contextlib import contextmanager
+
+
+class StageTimer:
+    def __init__(self) -> None:
+        """Accumulates wall time per named stage and records milestones since creation"""
+        self.started = perf_counter()
+        self.stages = {}
+        self.milestones = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            total, count = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (total + perf_counter() - start, count + 1)
+
+    def mark(self, name: str) -> bool:
+        """Records the first time a milestone is reached, returns False if it was already recorded"""
+        if name in self.milestones:
+            return False
+        self.milestones[name] = perf_counter() - self.started
+        return True
+
+    def merge(self, other: "StageTimer") -> None:
+        """Adds the stage times of another timer, used to total per application timers"""
+        for name, (total, count) in other.stages.items():
+            own_total, own_count = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (own_total + total, own_count + count)
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {total:.2f}s" for name, (total, _) in self.stages.items())
+
+    def report(self, title="Timings") -> str:
+        lines = [f"{title}:"]
+        for name, (total, count) in self.stages.items():
+            lines.append(f"  {name:<28}{total:>9.2f}s" + (f"  ({count} calls)" if count > 1 else ""))
+        for name, elapsed in self.milestones.items():
+            lines.append(f"  {name:<28}{elapsed:>9.2f}s after start")
+        return "\n".join(lines)
+
+
+# Process wide timer for startup stages and time-to-first-application
+startup_timer = StageTimer()
@@ -0,0 +1,111 @@
+import json
+import hashlib
+from os import path, listdir
+
+from config import SUMMARY_TEXT, QUESTIONS, ANSWERS, CONTEXT_TOP_K
+from config import TRAINING_EPOCHS, TRAINING_BATCH_SIZE
+from config import QUANTIZED_MODEL_NAME, ANSWER_ROUTER_NAME
+
+MANIFEST_NAME = "training_manifest.json"
+# Rebuilt from the saved model after every save, checked by is_artifact_current instead
+DERIVED_ARTIFACTS = (QUANTIZED_MODEL_NAME, ANSWER_ROUTER_NAME)
+
+
+def training_hyperparameters(num_train_epochs=TRAINING_EPOCHS, batch_size=TRAINING_BATCH_SIZE,
+                             max_length=512, max_label_length=16) -> dict:
+    """Settings of the full training that change the trained weights, a model trained with
+       other values is retrained. Early stopping patience only affects incremental runs."""
+    return {
+        "num_train_epochs": num_train_epochs,
+        "per_device_train_batch_size": batch_size,
+        "max_length": max_length,
+        "max_label_length": max_label_length,
+        "context_top_k": CONTEXT_TOP_K,
+    }
+
+
+def build_training_manifest(model_name: str, hyperparameters: dict, context=SUMMARY_TEXT,
+                            questions=QUESTIONS, answers=ANSWERS) -> dict:
+    data = json.dumps({"context": context, "questions": list(questions), "answers": list(answers)})
+    return {
+        "base_model": model_name,
+        "hyperparameters": hyperparameters,
+        "data_hash": hashlib.sha256(data.encode()).hexdigest(),
+    }
+
+
+def pair_hashes(questions, answers, contexts) -> list:
+    """Hashes every training pair together with the context passed along with it"""
+    return [hashlib.sha256(json.dumps([question, answer, context]).encode()).hexdigest()
+            for question, answer, context in zip(questions, answers, contexts)]
+
+
+def write_manifest(save_path: str, manifest: dict, pairs=None) -> None:
+    """Writes the manifest with the size of every file the model and tokenizer saved, so a broken
+       save can be detected, and the training pair hashes used to find new or changed pairs later"""
+    manifest = dict(manifest)
+    manifest["pairs"] = pairs or []
+    manifest["files"] = {
+        file_name: path.getsize(path.join(save_path, file_name))
+        for file_name in sorted(listdir(save_path))
+        if path.isfile(path.join(save_path, file_name))
+        and file_name != MANIFEST_NAME and file_name not in DERIVED_ARTIFACTS
+    }
+    with open(path.join(save_path, MANIFEST_NAME), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+
+def load_manifest(save_path: str):
+    try:
+        with open(path.join(save_path, MANIFEST_NAME), encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_compatible(save_path: str, saved_manifest, manifest: dict) -> bool:
+    """True if the saved model is intact and was trained from the same base model and settings"""
+    if not saved_manifest or not saved_manifest.get("files"):
+        return False
+
+    if saved_manifest.get("base_model") != manifest["base_model"]:
+        return False
+    # Manifests written before patience was dropped from the hyperparameters still record it
+    saved_hyperparameters = dict(saved_manifest.get("hyperparameters") or {})
+    saved_hyperparameters.pop("patience", None)
+    if saved_hyperparameters != manifest["hyperparameters"]:
+        return False
+
+    # Manifests written before derived artifacts were excluded may still list them
+    return all(
+        path.isfile(path.join(save_path, file_name))
+        and path.getsize(path.join(save_path, file_name)) == size
+        for file_name, size in saved_manifest["files"].items()
+        if file_name not in DERIVED_ARTIFACTS
+    )
+
+
+def is_artifact_current(save_path: str, artifact_name: str) -> bool:
+    """True if an artifact derived from the model exists and was written after the model's last save"""
+    artifact_path = path.join(save_path, artifact_name)
+    config_path = path.join(save_path, "config.json")
+    return (path.isfile(artifact_path) and path.isfile(config_path)
+            and path.getmtime(artifact_path) >= path.getmtime(config_path))
+
+
+def is_model_current(save_path: str, manifest: dict) -> bool:
+    """True if the saved model was trained from the same data and settings and is intact"""
+    saved_manifest = load_manifest(save_path)
+    return (_is_compatible(save_path, saved_manifest, manifest)
+            and saved_manifest.get("data_hash") == manifest["data_hash"])
+
+
+def changed_pairs(save_path: str, manifest: dict, pairs: list):
+    """Indices of the pairs the saved model was not trained on, or None if the saved model
+       can't be fine-tuned further and has to be trained from scratch"""
+    saved_manifest = load_manifest(save_path)
+    if not _is_compatible(save_path, saved_manifest, manifest) or not saved_manifest.get("pairs"):
+        return None
+
+    trained_pairs = set(saved_manifest["pairs"])
+    return [index for index, pair in enumerate(pairs) if pair not in trained_pairs]
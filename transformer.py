@@ -1,33 +1,87 @@
+import os
+import json
+import socket
+import hashlib
+from random import Random
+from os import path, makedirs, environ, cpu_count
 from logging import getLogger, ERROR
 from warnings import filterwarnings
 from tensorflow import compat
-from torch import device, cuda
-from torch.utils.data import Dataset
+from torch import device, cuda, save, load, qint8, set_num_threads
+from torch.multiprocessing import spawn
+from torch.nn import Linear
+from torch.quantization import quantize_dynamic
+from torch.utils.data import Dataset, Subset
 from transformers import T5ForConditionalGeneration, T5Tokenizer
 from transformers import Trainer, TrainingArguments
-from transformers import EarlyStoppingCallback
+from transformers import EarlyStoppingCallback, DataCollatorForSeq2Seq
 
-from config import FINE_TUNED_MODEL_PATH
+from context_retriever import ContextRetriever
+from training_manifest import training_hyperparameters, build_training_manifest
+from training_manifest import write_manifest, pair_hashes
+from config import FINE_TUNED_MODEL_PATH, CONTEXT_TOP_K
+from config import QUANTIZED_MODEL_NAME, TOKENIZED_DATASET_PATH
+from config import BASE_MODEL_NAME, TRAINING_EPOCHS, TRAINING_BATCH_SIZE, TRAINING_PATIENCE
+from config import TRAINING_EVAL_FRACTION, INCREMENTAL_EPOCHS, INCREMENTAL_REPLAY_RATIO
 from config import SUMMARY_TEXT, QUESTIONS, ANSWERS
 
 
 class QADatasetCustom(Dataset):
-    def __init__(self, tokenizer: T5Tokenizer, context, questions, answers, max_length=512):
-        """Defined custom dataset for multiple questions with a single context"""
-        self.context = context
+    def __init__(self, tokenizer: T5Tokenizer, context, questions, answers, max_length=512,
+                 top_k=CONTEXT_TOP_K, pretokenize=False, max_label_length=16, cache_path=None):
+        """Defined custom dataset for multiple questions with a single context, each question
+           is paired with the top-k context sentences relevant to it.
+           With pretokenize, every pair is tokenized once without padding (optionally cached to
+           cache_path) and batches are padded by a collator such as DataCollatorForSeq2Seq."""
+        self.contexts = ContextRetriever(context, top_k).retrieve_many(questions)
         self.questions = questions
         self.answers = answers
         self.tokenizer = tokenizer
         self.max_length = max_length
+        self.max_label_length = max_label_length
+        self.pretokenize = pretokenize
+        self.features = self._tokenize_all(cache_path) if pretokenize else None
+
+    def _tokenize_all(self, cache_path=None) -> list:
+        """Tokenizes all pairs in one batched call, reusing cache_path if it holds the same data"""
+        data_hash = hashlib.sha256(repr((
+            self.tokenizer.name_or_path, self.contexts, self.questions, self.answers,
+            self.max_length, self.max_label_length
+        )).encode()).hexdigest()
+
+        if cache_path and path.isfile(cache_path):
+            cached = load(cache_path)
+            if cached.get("data_hash") == data_hash:
+                return cached["features"]
+
+        input_texts = [f"question: {question}  context: {context}"
+                       for question, context in zip(self.questions, self.contexts)]
+        inputs = self.tokenizer(input_texts, truncation=True, max_length=self.max_length)
+        labels = self.tokenizer(list(self.answers), truncation=True, max_length=self.max_label_length)
+        features = [
+            {"input_ids": input_ids, "attention_mask": attention_mask, "labels": label_ids}
+            for input_ids, attention_mask, label_ids
+            in zip(inputs.input_ids, inputs.attention_mask, labels.input_ids)
+        ]
+
+        if cache_path:
+            if not path.exists(path.dirname(cache_path)):
+                makedirs(path.dirname(cache_path))
+            save({"data_hash": data_hash, "features": features}, cache_path)
+
+        return features
 
     def __len__(self):
         return len(self.questions)
 
     def __getitem__(self, idx):
+        if self.pretokenize:
+            return self.features[idx]
+
         question = self.questions[idx]
         answer = self.answers[idx]
 
-        input_text = f"question: {question}  context: {self.context}"
+        input_text = f"question: {question}  context: {self.contexts[idx]}"
         input_ids = self.tokenizer(input_text, truncation=True, padding='max_length',
                                    max_length=self.max_length, return_tensors="pt").input_ids.squeeze()
         labels = self.tokenizer(answer, truncation=True, padding='max_length',
@@ -38,14 +92,21 @@ class QADatasetCustom(Dataset):
 
 
 class QAModelCustom:
-    def __init__(self, model_name='t5-small'):
-        """Initializes model, tokenizer, and dataset"""
+    def __init__(self, model_name=BASE_MODEL_NAME, pretokenize=True, checkpoint_path=None,
+                 dataset_cache_path=TOKENIZED_DATASET_PATH):
+        """Initializes model, tokenizer, and dataset. With pretokenize the dataset is tokenized
+           once and every batch is padded only to its longest sequence. Weights are loaded from
+           checkpoint_path when given, to continue fine-tuning a model trained from model_name."""
         self.model_name = model_name
+        self.checkpoint_path = checkpoint_path
+        self.pretokenize = pretokenize
         self.context = SUMMARY_TEXT
         self.questions = QUESTIONS
         self.answers = ANSWERS
         self.training_args = ()
         self.trainer = ()
+        self.hyperparameters = None
+        self.train_metrics = {}
 
         # Set TensorFlow logging level to ERROR to suppress info logs
         compat.v1.logging.set_verbosity(compat.v1.logging.ERROR)
@@ -53,50 +114,161 @@ class QAModelCustom:
         filterwarnings("ignore", category=FutureWarning)
 
         self.device = device("cuda" if cuda.is_available() else "cpu")
-        self.model = T5ForConditionalGeneration.from_pretrained(self.model_name)
+        self.model = T5ForConditionalGeneration.from_pretrained(checkpoint_path or self.model_name)
         self.model = self.model.to(self.device)
 
-        self.tokenizer = T5Tokenizer.from_pretrained(self.model_name)
+        self.tokenizer = T5Tokenizer.from_pretrained(checkpoint_path or self.model_name)
         self.dataset = QADatasetCustom(
-            self.tokenizer, self.context, self.questions, self.answers
+            self.tokenizer, self.context, self.questions, self.answers,
+            pretokenize=self.pretokenize,
+            cache_path=dataset_cache_path if self.pretokenize else None
         )
+        self.data_collator = DataCollatorForSeq2Seq(
+            self.tokenizer, model=self.model, label_pad_token_id=-100
+        ) if self.pretokenize else None
 
-    def train_model(self, num_train_epochs=2, patience=3) -> None:
+    def train_model(self, num_train_epochs=2, batch_size=TRAINING_BATCH_SIZE,
+                    gradient_accumulation_steps=1, distributed=False) -> None:
         """Train the model based on a context, list of questions, and list of answers"""
         # Maintain epochs based on hardware(GPU or CPU)
         # You can also use Google golab to train model on faster GPU
+        self.hyperparameters = training_hyperparameters(
+            num_train_epochs, batch_size, max_length=self.dataset.max_length,
+            max_label_length=self.dataset.max_label_length
+        )
+
+        # Every pair is trained on, the manifest lists them all as known to the model.
+        # Only train_incremental holds pairs out, from those the checkpoint was already trained on.
+        self._train(list(range(len(self.dataset))), [], num_train_epochs, TRAINING_PATIENCE, batch_size,
+                    gradient_accumulation_steps, distributed)
+
+    def train_incremental(self, new_indices: list, num_train_epochs=INCREMENTAL_EPOCHS,
+                          patience=TRAINING_PATIENCE, batch_size=TRAINING_BATCH_SIZE,
+                          replay_ratio=INCREMENTAL_REPLAY_RATIO, eval_fraction=TRAINING_EVAL_FRACTION,
+                          hyperparameters=None) -> None:
+        """Continue fine-tuning the checkpoint on new or changed pairs mixed with a replay sample
+           of the pairs it was already trained on, early stopping on held-out old pairs"""
+        # Manifest keeps the settings of the full training so the model is seen as current after
+        self.hyperparameters = hyperparameters or training_hyperparameters()
+        if not new_indices:
+            return
+
+        new_indices = set(new_indices)
+        old_indices = [index for index in range(len(self.dataset)) if index not in new_indices]
+        Random(0).shuffle(old_indices)
+
+        eval_count = int(len(self.dataset) * eval_fraction)
+        eval_indices, old_indices = old_indices[:eval_count], old_indices[eval_count:]
+        replay_indices = old_indices[:int(len(new_indices) * replay_ratio)]
+        self._train(sorted(new_indices) + replay_indices, eval_indices,
+                    num_train_epochs, patience, batch_size)
+
+    def _train(self, train_indices, eval_indices, num_train_epochs, patience, batch_size,
+               gradient_accumulation_steps=1, distributed=False) -> None:
+        """Runs the Trainer on a subset of the dataset, with early stopping when there is an eval split.
+           With distributed the process joins a CPU data-parallel group set up by train_distributed."""
+        early_stopping = bool(eval_indices)
 
         self.training_args = TrainingArguments(
             output_dir=FINE_TUNED_MODEL_PATH + "/results",
             num_train_epochs=num_train_epochs,
-            per_device_train_batch_size=4,
-            save_steps=10_000,
+            per_device_train_batch_size=batch_size,
+            per_device_eval_batch_size=batch_size,
+            gradient_accumulation_steps=gradient_accumulation_steps,
+            use_cpu=distributed,
+            ddp_backend="gloo" if distributed else None,
+            save_strategy="epoch" if early_stopping else "no",
             save_total_limit=2,
             logging_dir=FINE_TUNED_MODEL_PATH + "/logs",
-            evaluation_strategy="steps",
-            eval_steps=500,
-            load_best_model_at_end=True,
+            evaluation_strategy="epoch" if early_stopping else "no",
+            load_best_model_at_end=early_stopping,
+            metric_for_best_model="eval_loss" if early_stopping else None,
+            group_by_length=self.pretokenize,
         )
 
         self.trainer = Trainer(
             model=self.model,
             args=self.training_args,
-            train_dataset=self.dataset,
-            callbacks=[EarlyStoppingCallback(early_stopping_patience=patience)],
+            train_dataset=Subset(self.dataset, train_indices),
+            eval_dataset=Subset(self.dataset, eval_indices) if early_stopping else None,
+            data_collator=self.data_collator,
+            callbacks=[EarlyStoppingCallback(early_stopping_patience=patience)] if early_stopping else [],
         )
 
-        self.trainer.train()
+        self.train_metrics = self.trainer.train().metrics
 
     def save_model(self, save_path=None) -> None:
-        """Save the fine-tuned pre-trained model and tokenizer to directory"""
+        """Save the fine-tuned pre-trained model, tokenizer, and training manifest to directory"""
         if not save_path:
             save_path = FINE_TUNED_MODEL_PATH
 
         self.model.save_pretrained(save_path)
         self.tokenizer.save_pretrained(save_path)
+        if self.hyperparameters:
+            write_manifest(save_path, build_training_manifest(
+                self.model_name, self.hyperparameters, self.context, self.questions, self.answers
+            ), pair_hashes(self.questions, self.answers, self.dataset.contexts))
+
+    def export_quantized_model(self, save_path=None) -> None:
+        """Save a dynamic int8 quantized copy of the model for faster CPU inference"""
+        if not save_path:
+            save_path = FINE_TUNED_MODEL_PATH
+
+        model = self.model.to("cpu").eval()
+        quantized_model = quantize_dynamic(model, {Linear}, dtype=qint8)
+        save(quantized_model, path.join(save_path, QUANTIZED_MODEL_NAME))
+
+
+def _distributed_worker(rank, world_size, master_port, threads_per_process, train_options,
+                        save_path, metrics_path) -> None:
+    """Entry point of one data-parallel training process"""
+    environ.update({
+        "MASTER_ADDR": "127.0.0.1", "MASTER_PORT": str(master_port),
+        "RANK": str(rank), "LOCAL_RANK": str(rank), "WORLD_SIZE": str(world_size),
+    })
+
+    # Pin every process to its own cores so the ranks don't compete for the same ones
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        own_cores = cores[rank * threads_per_process:(rank + 1) * threads_per_process]
+        if own_cores:
+            os.sched_setaffinity(0, own_cores)
+    set_num_threads(threads_per_process)
+
+    # Only the first rank may write the shared tokenized dataset cache
+    model = QAModelCustom(dataset_cache_path=TOKENIZED_DATASET_PATH if rank == 0 else None)
+    model.train_model(distributed=True, **train_options)
+
+    if rank == 0:
+        if save_path:
+            model.save_model(save_path)
+            model.export_quantized_model(save_path)
+        if metrics_path:
+            with open(metrics_path, "w", encoding="utf-8") as file:
+                json.dump(model.train_metrics, file)
+
+
+def train_distributed(num_processes: int, threads_per_process=None, gradient_accumulation_steps=1,
+                      save_path=FINE_TUNED_MODEL_PATH, metrics_path=None, **train_options) -> None:
+    """Train on CPU with num_processes data-parallel processes (torch distributed, gloo backend).
+       The model is saved by the first process in the same format as QAModelCustom.save_model."""
+    threads_per_process = threads_per_process or max(1, (cpu_count() or 1) // num_processes)
+    train_options["gradient_accumulation_steps"] = gradient_accumulation_steps
+
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        master_port = free_socket.getsockname()[1]
+
+    spawn(
+        _distributed_worker,
+        args=(num_processes, master_port, threads_per_process, train_options, save_path, metrics_path),
+        nprocs=num_processes,
+        join=True,
+    )
 
 
 if __name__ == "__main__":
     model = QAModelCustom()
-    model.train_model(num_train_epochs=35)
+    model.train_model(num_train_epochs=TRAINING_EPOCHS)
     model.save_model()
+    model.export_quantized_model()